@@ -0,0 +1,277 @@
+"""
+人物关系网络分析模块
+
+对每部剧的关系图计算：
+- 度中心性与介数中心性（Brandes 算法）
+- 阵营划分（标签传播）
+- 关系类型统计
+
+结果保存在 data/analytics/<剧集ID>.json 中，页面只读取不计算。
+计算按连通分量进行并按分量内容哈希缓存：修改一条边时只会重算
+受影响的分量，其他分量和其他剧集的结果都直接复用。
+批量计算全部剧集：python analytics.py
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, deque
+
+import catalog
+import graph
+
+ANALYTICS_DIR = os.path.join(catalog.DATA_DIR, "analytics")
+# 标签传播的最大迭代次数
+MAX_PROPAGATION_ROUNDS = 20
+
+# (剧集ID) -> (关系图数据版本, 分析结果)
+_RESULTS = {}
+_LOCK = threading.Lock()
+
+
+def connected_components(index):
+    """
+    划分连通分量
+    :param index: graph.GraphIndex 实例
+    :return: 节点ID列表的列表，每个列表按节点在数据中的顺序排列
+    """
+    order = {n: i for i, n in enumerate(index.node_ids)}
+    seen = set()
+    components = []
+    for start in index.node_ids:
+        if start in seen:
+            continue
+        seen.add(start)
+        members = [start]
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for neighbor in index.adj[node]:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    members.append(neighbor)
+                    queue.append(neighbor)
+        components.append(sorted(members, key=order.get))
+    return components
+
+
+def component_hash(index, members):
+    """
+    计算连通分量的内容哈希（节点及其之间的边），用于增量复用
+    :param index: graph.GraphIndex 实例
+    :param members: 分量内的节点ID列表
+    :return: 哈希字符串
+    """
+    edges = sorted(sorted((n, m)) for n in members for m in index.adj[n] if n < m)
+    raw = json.dumps([sorted(members), edges], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def betweenness(index, members):
+    """
+    Brandes 算法计算分量内各节点的介数中心性（无向、无权，未归一化）
+    :param index: graph.GraphIndex 实例
+    :param members: 分量内的节点ID列表
+    :return: {节点ID: 介数}
+    """
+    scores = dict.fromkeys(members, 0.0)
+    for source in members:
+        stack = []
+        preds = {n: [] for n in members}
+        sigma = dict.fromkeys(members, 0)
+        dist = dict.fromkeys(members, -1)
+        sigma[source], dist[source] = 1, 0
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            stack.append(v)
+            for w in index.adj[v]:
+                if dist[w] < 0:
+                    dist[w] = dist[v] + 1
+                    queue.append(w)
+                if dist[w] == dist[v] + 1:
+                    sigma[w] += sigma[v]
+                    preds[w].append(v)
+        delta = dict.fromkeys(members, 0.0)
+        while stack:
+            w = stack.pop()
+            for v in preds[w]:
+                delta[v] += sigma[v] / sigma[w] * (1 + delta[w])
+            if w != source:
+                scores[w] += delta[w]
+    # 无向图中每条路径被统计了两次
+    return {n: s / 2 for n, s in scores.items()}
+
+
+def communities(index, members):
+    """
+    标签传播划分阵营：每个节点反复采用邻居中最常见的标签
+    :param index: graph.GraphIndex 实例
+    :param members: 分量内的节点ID列表
+    :return: {节点ID: 阵营代表节点ID}
+    """
+    labels = {n: n for n in members}
+    for _ in range(MAX_PROPAGATION_ROUNDS):
+        changed = False
+        for node in members:
+            neighbors = index.adj[node]
+            if not neighbors:
+                continue
+            counts = Counter(labels[m] for m in neighbors)
+            best = max(counts.values())
+            # 平局时取字典序最小的标签，保证结果可复现
+            label = min(l for l, c in counts.items() if c == best)
+            if label != labels[node]:
+                labels[node] = label
+                changed = True
+        if not changed:
+            break
+    return labels
+
+
+def analyze_component(index, members):
+    """
+    计算单个连通分量的分析结果
+    :param index: graph.GraphIndex 实例
+    :param members: 分量内的节点ID列表
+    :return: {"betweenness": {...}, "community": {...}}
+    """
+    return {"betweenness": betweenness(index, members), "community": communities(index, members)}
+
+
+def relation_stats(edges):
+    """
+    统计关系类型，复合关系（如"姑侄/恋人"）拆开分别计数
+    :param edges: (源节点, 目标节点, 关系) 列表
+    :return: [(关系, 数量), ...]，按数量降序
+    """
+    counter = Counter(part.strip() for _, _, lbl in edges for part in lbl.split("/") if part.strip())
+    return counter.most_common()
+
+
+def _analytics_path(show_id):
+    """
+    获取分析结果文件路径
+    :param show_id: 剧集ID
+    :return: JSON文件路径
+    """
+    return os.path.join(ANALYTICS_DIR, f"{show_id}.json")
+
+
+def _read_stored(show_id):
+    """
+    读取已保存的分析结果
+    :param show_id: 剧集ID
+    :return: 分析结果字典；不存在或损坏时返回 None
+    """
+    try:
+        with open(_analytics_path(show_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_stored(show_id, result):
+    """
+    保存分析结果（先写临时文件再替换，避免读到写了一半的文件）
+    :param show_id: 剧集ID
+    :param result: 分析结果字典
+    """
+    os.makedirs(ANALYTICS_DIR, exist_ok=True)
+    path = _analytics_path(show_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def compute(show, version, previous=None):
+    """
+    计算一部剧的分析结果，复用 previous 中内容未变的连通分量
+    :param show: 剧集数据
+    :param version: 关系图数据版本（graph.graph_version）
+    :param previous: 上一次保存的分析结果
+    :return: (分析结果字典, 重新计算的分量数)
+    """
+    index = graph.GraphIndex(show["nodes"], show["edges"])
+    reusable = (previous or {}).get("components", {})
+    components = {}
+    recomputed = 0
+    for members in connected_components(index):
+        key = component_hash(index, members)
+        if key not in reusable:
+            reusable[key] = analyze_component(index, members)
+            recomputed += 1
+        components[key] = reusable[key]
+
+    n = len(index.node_ids)
+    # 归一化：无向图中介数的最大可能值为 (n-1)(n-2)/2
+    scale = 2 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+    degree_scale = 1 / (n - 1) if n > 1 else 1.0
+    raw_betweenness = {}
+    raw_community = {}
+    for result in components.values():
+        raw_betweenness.update(result["betweenness"])
+        raw_community.update(result["community"])
+
+    # 阵营按人数从多到少编号
+    sizes = Counter(raw_community.values())
+    order = {label: i for i, (label, _) in enumerate(sorted(sizes.items(), key=lambda kv: (-kv[1], kv[0])))}
+    result = {
+        "version": version,
+        "degree": {node: len(index.adj[node]) * degree_scale for node in index.node_ids},
+        "betweenness": {node: raw_betweenness[node] * scale for node in index.node_ids},
+        "community": {node: order[raw_community[node]] for node in index.node_ids},
+        "relations": relation_stats(index.edges),
+        "components": components,
+    }
+    return result, recomputed
+
+
+def ensure(show, show_version):
+    """
+    获取分析结果，关系图数据变化时增量重算并保存
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :return: 分析结果字典
+    """
+    version = graph.graph_version(show, show_version)
+    cached = _RESULTS.get(show["id"])
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _LOCK:
+        cached = _RESULTS.get(show["id"])
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        stored = _read_stored(show["id"])
+        if stored is None or stored.get("version") != version:
+            stored, _ = compute(show, version, stored)
+            _write_stored(show["id"], stored)
+        _RESULTS[show["id"]] = (version, stored)
+        return stored
+
+
+def top_nodes(result, metric="betweenness", n=5):
+    """
+    按指标排序的核心人物
+    :param result: 分析结果字典
+    :param metric: "betweenness" 或 "degree"
+    :param n: 返回数量
+    :return: [(节点ID, 指标值), ...]
+    """
+    return sorted(result[metric].items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+if __name__ == "__main__":
+    for entry in catalog.load_index():
+        show = catalog.load_show(entry["id"])
+        version = graph.graph_version(show, catalog.show_version(show["id"]))
+        previous = _read_stored(show["id"])
+        if previous is not None and previous.get("version") == version:
+            print(f"{show['id']}: 未变化")
+            continue
+        result, recomputed = compute(show, version, previous)
+        _write_stored(show["id"], result)
+        print(f"{show['id']}: 重算 {recomputed}/{len(result['components'])} 个连通分量")
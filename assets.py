@@ -0,0 +1,548 @@
+"""
+图片资源加载模块
+
+Streamlit 每次交互都会重新执行 app.py，但被 import 的模块只会加载一次，
+因此这里的缓存在整个进程内（所有会话、所有重跑之间）共享。
+
+除原图外，还可以为不同的展示位置生成缩小后的衍生图（variant），
+衍生图按内容哈希命名，保存在 .cache/derivatives 目录中。
+离线预生成全部衍生图：python assets.py
+
+图片默认以 Base64 data URI 内联到页面中。设置环境变量
+TVAPP_ASSET_MODE=static 后，图片会发布到 static/assets 目录，
+通过 Streamlit 的静态文件服务（/app/static/...）以短URL提供。
+文件名即内容哈希，内容变化即换URL；但 Streamlit 1.65 的静态文件服务（Starlette）
+不返回 Cache-Control，只有 ETag / Last-Modified，浏览器按启发式缓存并用 304 校验，
+需要 immutable 长期缓存时应在前面的反向代理或CDN上为 /app/static/assets/ 加缓存头
+（launcher.py 的代理已经这样做）。
+
+进程内缓存都是有界的 LRU：data URI 按总字节数（MAX_CACHED_BYTES）淘汰，
+其余缓存按条目数（MAX_CACHED_ENTRIES）淘汰，内存占用不随剧集目录的规模增长。
+
+所有图片在使用前都会经过检查（inspect）：按文件头识别真实格式（而不是扩展名），
+拒绝无法识别、已损坏或像素数过大的文件；超过 MAX_BYTES / MAX_DIMENSION 的原图
+不会原样发给浏览器，而是缩小为 "capped" 规格的衍生图。
+
+衍生图可以编码为 JPEG、WebP 或 AVIF（取决于 Pillow 是否带有对应编码器），
+negotiate() 根据浏览器的 Accept / User-Agent 选出它支持的最佳格式，JPEG 兜底。
+"""
+
+import base64
+import hashlib
+import os
+import re
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # 未安装Pillow时直接使用原图
+    Image = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DERIVATIVE_DIR = os.path.join(BASE_DIR, ".cache", "derivatives")
+
+# 图片输出方式：inline（Base64内联）或 static（静态文件URL）
+ASSET_MODE = os.environ.get("TVAPP_ASSET_MODE", "inline")
+STATIC_DIR = os.path.join(BASE_DIR, "static", "assets")
+# 部署在 server.baseUrlPath 之下时需要相应修改前缀
+STATIC_URL_PREFIX = os.environ.get("TVAPP_STATIC_URL_PREFIX", "/app/static/assets")
+
+# 各展示位置对应的衍生图规格（按2倍像素密度留出余量），quality 为 JPEG 质量
+VARIANTS = {
+    # 人物关系图中 30px 的圆形节点
+    "node": {"size": (96, 96), "crop": True, "quality": 80},
+    # 剧集页面顶部 1/5 宽度的海报
+    "banner": {"size": (360, 540), "crop": False, "quality": 82},
+    # 首页三列网格中的海报
+    "grid": {"size": (480, 720), "crop": False, "quality": 82},
+    # 超出限制、需要原图尺寸的场景
+    "capped": {"size": (2048, 2048), "crop": False, "quality": 85},
+}
+
+# 衍生图的编码格式，按优先级从高到低排列。
+# quality_offset 是相对 JPEG 质量的调整：WebP、AVIF 在更低的质量值下就能达到相近的观感
+FORMATS = {
+    "avif": {"mime": "image/avif", "pil": "AVIF", "ext": ".avif", "quality_offset": -27, "options": {"speed": 6}},
+    "webp": {"mime": "image/webp", "pil": "WEBP", "ext": ".webp", "quality_offset": -2, "options": {"method": 6}},
+    "jpeg": {"mime": "image/jpeg", "pil": "JPEG", "ext": ".jpg", "quality_offset": 0,
+             "options": {"optimize": True, "progressive": True}},
+}
+
+# 原图的大小与尺寸上限，超出时改用 capped 衍生图
+MAX_BYTES = int(os.environ.get("TVAPP_MAX_ASSET_BYTES", 4 * 1024 * 1024))
+MAX_DIMENSION = 2048
+# 超过该像素数的图片直接拒绝（防止解压炸弹）
+MAX_PIXELS = 50_000_000
+# 浏览器 User-Agent -> 开始支持 (WebP, AVIF) 的主版本号；
+# 用于 Accept 头里没有图片类型的情况（例如 WebSocket 握手请求）。
+# Safari 不在表中：它的解码能力取决于系统版本，而 macOS 的 User-Agent 固定为 10_15_7，
+# 无法判断；图片以单个地址输出、没有回退，所以 Safari 只在 Accept 头列出类型时才使用新格式
+_UA_SUPPORT = (
+    (re.compile(r"Edg/(\d+)"), 18, 121),
+    (re.compile(r"Firefox/(\d+)"), 65, 93),
+    (re.compile(r"Chrome/(\d+)"), 32, 85),
+)
+# Base64 分块编码的块大小（必须是3的倍数）
+_B64_CHUNK = 3 * (1 << 16)
+
+# 文件头签名 -> MIME类型
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif",
+               "image/webp": ".webp", "image/avif": ".avif"}
+
+# data URI 缓存的总大小上限（字节），超出时淘汰最久未使用的图片
+MAX_CACHED_BYTES = int(os.environ.get("TVAPP_ASSET_CACHE_MB", 64)) * 1024 * 1024
+# 其他缓存（衍生图路径、静态URL、检查结果）各自最多保留的条目数
+MAX_CACHED_ENTRIES = 4096
+
+# 缓存结构：键 -> (mtime_ns, 文件大小, 值)，按最近使用顺序排列
+# _CACHE: 文件路径 -> data URI；_DERIVED: (路径, 规格, 格式) -> 衍生图路径；
+# _PUBLISHED: 文件路径 -> 静态URL；_INSPECTED: 文件路径 -> 检查结果或 AssetError
+_CACHE = OrderedDict()
+_DERIVED = OrderedDict()
+_PUBLISHED = OrderedDict()
+_INSPECTED = OrderedDict()
+_STATE = {"cached_bytes": 0}
+_LOCK = threading.Lock()
+
+
+def _lookup(cache, key, version):
+    """
+    读取缓存并标记为最近使用
+    :param cache: 缓存字典
+    :param key: 缓存键
+    :param version: 文件版本（_file_key 的返回值）
+    :return: 缓存的值；不存在或文件已变化时返回 None
+    """
+    with _LOCK:
+        entry = cache.get(key)
+        if entry is None or entry[:2] != version:
+            return None
+        cache.move_to_end(key)
+        return entry[2]
+
+
+def _store(cache, key, version, value):
+    """
+    写入缓存，超过 MAX_CACHED_ENTRIES 时淘汰最久未使用的条目
+    :param cache: 缓存字典（_CACHE 以外）
+    :param key: 缓存键
+    :param version: 文件版本
+    :param value: 值
+    """
+    with _LOCK:
+        cache[key] = (version[0], version[1], value)
+        cache.move_to_end(key)
+        while len(cache) > MAX_CACHED_ENTRIES:
+            cache.popitem(last=False)
+
+
+def _store_uri(key, version, uri):
+    """
+    写入 data URI 缓存，总大小超过 MAX_CACHED_BYTES 时淘汰最久未使用的图片
+    :param key: 文件路径
+    :param version: 文件版本
+    :param uri: data URI
+    """
+    if len(uri) > MAX_CACHED_BYTES:
+        return
+    with _LOCK:
+        old = _CACHE.pop(key, None)
+        if old is not None:
+            _STATE["cached_bytes"] -= len(old[2])
+        _CACHE[key] = (version[0], version[1], uri)
+        _STATE["cached_bytes"] += len(uri)
+        while _STATE["cached_bytes"] > MAX_CACHED_BYTES:
+            _, evicted = _CACHE.popitem(last=False)
+            _STATE["cached_bytes"] -= len(evicted[2])
+
+
+def _encoder_available(fmt):
+    """
+    判断当前 Pillow 是否能编码指定格式
+    :param fmt: FORMATS 中的格式名称
+    :return: 可用时返回 True
+    """
+    if Image is None:
+        return False
+    if fmt == "jpeg":
+        return True
+    try:
+        return bool(features.check(fmt))
+    except ValueError:  # 旧版 Pillow 不认识该特性名称
+        return False
+
+
+# 当前环境可以编码的格式（按优先级排列）
+AVAILABLE_FORMATS = tuple(fmt for fmt in FORMATS if _encoder_available(fmt))
+
+
+def negotiate(accept="", user_agent=""):
+    """
+    选出浏览器支持、且当前环境能够编码的最佳图片格式
+    :param accept: 请求的 Accept 头
+    :param user_agent: 请求的 User-Agent 头
+    :return: FORMATS 中的格式名称，无法判断时返回 "jpeg"
+    """
+    supported = {fmt for fmt in FORMATS if FORMATS[fmt]["mime"] in accept}
+    for pattern, webp_since, avif_since in _UA_SUPPORT:
+        match = pattern.search(user_agent)
+        if match:
+            version = int(match.group(1))
+            if version >= webp_since:
+                supported.add("webp")
+            if version >= avif_since:
+                supported.add("avif")
+            break
+    for fmt in AVAILABLE_FORMATS:
+        if fmt in supported:
+            return fmt
+    return "jpeg"
+
+
+class AssetError(ValueError):
+    """图片格式无法识别、文件已损坏或超出限制"""
+
+
+def _file_key(file_path):
+    """
+    获取文件的版本标识（修改时间 + 大小），文件变化时缓存自动失效
+    :param file_path: 文件路径
+    :return: (mtime_ns, size) 元组
+    """
+    st = os.stat(file_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _file_digest(file_path):
+    """
+    计算文件内容的SHA-256摘要
+    :param file_path: 文件路径
+    :return: 十六进制摘要字符串
+    """
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sniff_format(file_path):
+    """
+    根据文件头识别图片的真实格式
+    :param file_path: 图片路径
+    :return: MIME类型；无法识别时返回 None
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(16)
+    for signature, mime in _SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "image/avif"
+    return None
+
+
+def _inspect(file_path):
+    """
+    检查图片的格式、大小和尺寸（不解码像素）
+    :param file_path: 图片路径
+    :return: {"mime": MIME类型, "bytes": 文件大小, "size": (宽, 高) 或 None}
+    :raises AssetError: 格式无法识别、文件已损坏或像素数过大
+    """
+    mime = sniff_format(file_path)
+    if mime is None:
+        raise AssetError(f"无法识别的图片格式: {file_path}")
+    info = {"mime": mime, "bytes": os.path.getsize(file_path), "size": None}
+    if Image is not None:
+        try:
+            with Image.open(file_path) as img:
+                info["size"] = img.size
+                # 逐块校验文件结构（PNG 校验 CRC），不会把整张图解码到内存
+                img.verify()
+        except Exception as e:
+            raise AssetError(f"图片已损坏或无法解码: {file_path}: {e}") from e
+        width, height = info["size"]
+        if width * height > MAX_PIXELS:
+            raise AssetError(f"图片像素过多（{width}x{height}）: {file_path}")
+    return info
+
+
+def inspect(file_path):
+    """
+    检查图片，结果（包括失败原因）按文件版本缓存
+    :param file_path: 图片路径
+    :return: {"mime": MIME类型, "bytes": 文件大小, "size": (宽, 高) 或 None}
+    :raises AssetError: 格式无法识别、文件已损坏或像素数过大
+    :raises OSError: 文件不存在或无法读取
+    """
+    key = _file_key(file_path)
+    result = _lookup(_INSPECTED, file_path, key)
+    if result is None:
+        try:
+            result = _inspect(file_path)
+        except AssetError as e:
+            result = e
+        _store(_INSPECTED, file_path, key, result)
+    if isinstance(result, AssetError):
+        raise result
+    return result
+
+
+def within_limits(info):
+    """
+    判断原图能否直接提供给浏览器
+    :param info: inspect() 的返回值
+    :return: 大小和尺寸都在限制以内时返回 True
+    """
+    if info["bytes"] > MAX_BYTES:
+        return False
+    return info["size"] is None or max(info["size"]) <= MAX_DIMENSION
+
+
+def _render_variant(file_path, spec, out_path, fmt="jpeg"):
+    """
+    按规格缩放并重新编码图片，原子地写入目标路径
+    :param file_path: 原图路径
+    :param spec: VARIANTS 中的规格字典
+    :param out_path: 输出文件路径
+    :param fmt: FORMATS 中的格式名称
+    """
+    with Image.open(file_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            # 透明背景（例如PNG头像）铺白底，各格式的输出保持一致
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            rgba = img.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            img = background
+        if spec["crop"]:
+            img = ImageOps.fit(img, spec["size"], Image.LANCZOS)
+        else:
+            img = img.copy()
+            img.thumbnail(spec["size"], Image.LANCZOS)
+        tmp_path = f"{out_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        encoder = FORMATS[fmt]
+        img.save(tmp_path, encoder["pil"], quality=spec["quality"] + encoder["quality_offset"], **encoder["options"])
+    os.replace(tmp_path, out_path)
+
+
+def derivative_path(file_path, variant, fmt="jpeg"):
+    """
+    获取原图在指定展示位置下的衍生图路径，不存在时即时生成
+    :param file_path: 原图路径
+    :param variant: VARIANTS 中的规格名称
+    :param fmt: FORMATS 中的格式名称；当前环境无法编码时改用 JPEG
+    :return: 衍生图路径；未安装Pillow或生成失败时返回原图路径
+    :raises AssetError: 原图格式无法识别、已损坏或像素数过大
+    :raises OSError: 原图不存在或无法读取
+    """
+    if fmt not in AVAILABLE_FORMATS:
+        fmt = "jpeg"
+    key = _file_key(file_path)
+    cache_key = (file_path, variant, fmt)
+    cached = _lookup(_DERIVED, cache_key, key)
+    if cached is not None:
+        return cached
+
+    spec = VARIANTS[variant]
+    inspect(file_path)
+    if Image is None:
+        return file_path
+
+    # 缩放和编码在锁外进行，多个线程可以同时处理不同的图片；
+    # 偶尔重复生成同一张衍生图也无妨，写入是原子的
+    # 内容寻址：文件名由原图内容和规格共同决定，内容不变则复用
+    spec_id = f"{spec['size'][0]}x{spec['size'][1]}-{int(spec['crop'])}-q{spec['quality']}"
+    if fmt != "jpeg":
+        spec_id += f"-{fmt}"
+    name = hashlib.sha256(f"{_file_digest(file_path)}:{spec_id}".encode()).hexdigest()[:24]
+    out_path = os.path.join(DERIVATIVE_DIR, name + FORMATS[fmt]["ext"])
+    if not os.path.exists(out_path):
+        os.makedirs(DERIVATIVE_DIR, exist_ok=True)
+        try:
+            _render_variant(file_path, spec, out_path, fmt)
+        except Exception:
+            # 新格式编码失败时退回 JPEG；图片无法解码时退回原图，由调用方决定如何处理
+            out_path = derivative_path(file_path, variant) if fmt != "jpeg" else file_path
+    _store(_DERIVED, cache_key, key, out_path)
+    return out_path
+
+
+def _mime_of(path):
+    """
+    根据衍生图的扩展名获取MIME类型
+    :param path: 衍生图路径
+    :return: MIME类型
+    """
+    ext = os.path.splitext(path)[1]
+    return next(f["mime"] for f in FORMATS.values() if f["ext"] == ext)
+
+
+def resolve(file_path, variant=None, fmt="jpeg"):
+    """
+    确定实际提供给浏览器的文件：指定规格时使用衍生图，超出限制的原图改用 capped 衍生图
+    :param file_path: 原图路径
+    :param variant: 衍生图规格名称，None 表示使用原图
+    :param fmt: 衍生图的编码格式（FORMATS 中的名称）
+    :return: (文件路径, MIME类型) 元组
+    :raises AssetError: 图片无法使用，或超出限制且无法缩小
+    :raises OSError: 文件不存在或无法读取
+    """
+    info = inspect(file_path)
+    if variant is None and not within_limits(info):
+        variant = "capped"
+    if variant is not None:
+        derived = derivative_path(file_path, variant, fmt)
+        if derived != file_path:
+            return derived, _mime_of(derived)
+    if not within_limits(info):
+        raise AssetError(f"图片超出限制且无法缩小（{info['bytes'] // 1024} KB, {info['size']}）: {file_path}")
+    return file_path, info["mime"]
+
+
+def _encode_base64(file_path):
+    """
+    分块读取并编码文件，不需要一次性把整个文件读入内存
+    :param file_path: 文件路径
+    :return: Base64字符串
+    """
+    parts = []
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_B64_CHUNK), b""):
+            parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
+
+def load_data_uri(file_path, mime=None, variant=None, fmt="jpeg"):
+    """
+    读取本地图片并转换为Base64 data URI，同一文件在进程内只读取编码一次
+    :param file_path: 本地图片路径
+    :param mime: 图片的MIME类型，None 表示按文件头识别
+    :param variant: 衍生图规格名称，None 表示使用原图
+    :param fmt: 衍生图的编码格式
+    :return: Base64编码的图片字符串
+    :raises AssetError: 图片无法使用
+    :raises OSError: 文件不存在或无法读取
+    """
+    file_path, detected = resolve(file_path, variant, fmt)
+    mime = mime or detected
+
+    key = _file_key(file_path)
+    cached = _lookup(_CACHE, file_path, key)
+    if cached is not None:
+        return cached
+
+    # 读取和编码在锁外进行，只在写入缓存时加锁
+    uri = f"data:{mime};base64,{_encode_base64(file_path)}"
+    _store_uri(file_path, key, uri)
+    return uri
+
+
+def clear_cache():
+    """清空进程内的图片缓存"""
+    with _LOCK:
+        _CACHE.clear()
+        _STATE["cached_bytes"] = 0
+        _DERIVED.clear()
+        _PUBLISHED.clear()
+        _INSPECTED.clear()
+
+
+def static_url(file_path, variant=None, fmt="jpeg"):
+    """
+    将图片发布到静态目录，返回以内容哈希命名的短URL
+    :param file_path: 本地图片路径
+    :param variant: 衍生图规格名称，None 表示使用原图
+    :param fmt: 衍生图的编码格式
+    :return: 形如 /app/static/assets/<hash>.jpg 的URL
+    :raises AssetError: 图片无法使用
+    :raises OSError: 文件不存在或无法读取
+    """
+    file_path, mime = resolve(file_path, variant, fmt)
+
+    key = _file_key(file_path)
+    cached = _lookup(_PUBLISHED, file_path, key)
+    if cached is not None:
+        return cached
+
+    # 文件名由内容决定，内容变化即换URL，不需要额外的版本参数。
+    # 静态文件服务只返回 ETag / Last-Modified（没有 Cache-Control），
+    # 浏览器缓存后重复访问只需一次 304 校验
+    digest = _file_digest(file_path)[:24]
+    # 扩展名按真实格式确定，静态文件服务据此返回正确的 Content-Type
+    ext = _EXTENSIONS[mime]
+    name = f"{digest}{ext}"
+    target = os.path.join(STATIC_DIR, name)
+    if not os.path.exists(target):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(file_path, tmp_path)
+        except OSError:
+            shutil.copyfile(file_path, tmp_path)
+        os.replace(tmp_path, target)
+    url = f"{STATIC_URL_PREFIX}/{name}"
+    _store(_PUBLISHED, file_path, key, url)
+    return url
+
+
+def image_src(file_path, variant=None, fmt="jpeg"):
+    """
+    按当前的图片输出方式返回可直接交给 st.image / Node 的图片地址
+    :param file_path: 本地图片路径
+    :param variant: 衍生图规格名称，None 表示使用原图
+    :param fmt: 衍生图的编码格式（见 negotiate()）
+    :return: data URI 或静态文件URL
+    :raises AssetError: 图片无法使用
+    :raises OSError: 文件不存在或无法读取
+    """
+    if ASSET_MODE == "static":
+        return static_url(file_path, variant, fmt)
+    return load_data_uri(file_path, variant=variant, fmt=fmt)
+
+
+def build_all(directories=("posters", "avatars"), formats=AVAILABLE_FORMATS):
+    """
+    离线预生成目录下所有图片的衍生图
+    :param directories: 需要处理的图片目录
+    :param formats: 需要生成的编码格式
+    :return: (原图, 规格, 衍生图) 列表；无法使用的图片衍生图为 AssetError
+    """
+    # 海报用于首页网格和剧集页横幅，头像用于关系图节点
+    plan = {"posters": ("grid", "banner"), "avatars": ("node",)}
+    results = []
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            src = os.path.join(directory, name)
+            if not os.path.isfile(src):
+                continue
+            for variant in plan.get(os.path.basename(directory), tuple(VARIANTS)):
+                for fmt in formats:
+                    label = f"{variant}/{fmt}"
+                    try:
+                        results.append((src, label, derivative_path(src, variant, fmt)))
+                    except AssetError as e:
+                        results.append((src, label, e))
+    return results
+
+
+if __name__ == "__main__":
+    if Image is None:
+        sys.exit("需要安装 Pillow 才能生成衍生图：pip install Pillow")
+    for src, variant, out in build_all(sys.argv[1:] or ("posters", "avatars")):
+        if isinstance(out, AssetError):
+            print(f"{src} [{variant}] 已跳过: {out}")
+            continue
+        before, after = os.path.getsize(src), os.path.getsize(out)
+        print(f"{src} [{variant}] {before // 1024} KB -> {after // 1024} KB")
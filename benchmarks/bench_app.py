@@ -0,0 +1,260 @@
+"""
+app.py 无浏览器基准测试
+
+用 Streamlit 的 AppTest 在进程内驱动 app.py，按真实的使用路径逐步操作：
+打开首页 -> 依次进入每部剧 -> 切换物理引擎/剧情进度 -> 展开全部季/切换季 ->
+答完全部题目 -> 再玩一次 -> 回到首页。
+
+每一步记录：
+- wall_ms        本步重跑的耗时
+- rss_kb         本步结束时的常驻内存；peak_rss_kb 为进程的峰值常驻内存
+- alloc_blocks   本步结束后净增的内存块数（sys.getallocatedblocks）
+- traced_peak_kb 本步内 Python 分配的峰值（仅 --tracemalloc 时记录，会明显变慢）
+- delta_bytes    本步发往前端的序列化消息大小（ForwardMsg.ByteSize 之和）
+
+用法（在仓库根目录运行，全程离线）：
+    python benchmarks/bench_app.py                  # 运行并与 baseline.json 比较
+    python benchmarks/bench_app.py --save-baseline  # 在本机重新生成基线
+    python benchmarks/bench_app.py --repeat 5 --threshold 0.3
+
+结果保存在 benchmarks/results/<时间>.json；任一步的耗时、消息大小或内存块数
+超出基线 threshold 比例（且超过绝对下限）时以退出码 1 结束。
+注意 AppTest 不经过服务端的消息缓存，delta_bytes 是未去重的上限。
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+
+# 基准测试不写性能日志，避免磁盘写入干扰计时
+os.environ.setdefault("TVAPP_PERF_LOG", "0")
+os.chdir(REPO_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import streamlit.testing.v1.app_test as app_test  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import catalog  # noqa: E402
+import warmup  # noqa: E402
+
+# 比较时各指标的绝对下限：差值小于下限时不算退化。
+# 单步耗时在同一台机器上也会有 20ms 左右的抖动；消息大小和内存块数基本是确定的
+MIN_DELTA = {"wall_ms": 25.0, "delta_bytes": 1024, "alloc_blocks": 2000}
+
+# 当前这一步收到的消息大小
+_MESSAGES = {"bytes": 0, "count": 0}
+
+
+class _MeasuringRunner(app_test.LocalScriptRunner):
+    """记录每次重跑产生的 ForwardMsg 大小"""
+
+    def forward_msgs(self):
+        msgs = super().forward_msgs()
+        _MESSAGES["bytes"] += sum(m.ByteSize() for m in msgs)
+        _MESSAGES["count"] += len(msgs)
+        return msgs
+
+
+app_test.LocalScriptRunner = _MeasuringRunner
+
+
+def _rss_kb():
+    """
+    读取当前进程的常驻内存
+    :return: 千字节
+    """
+    with open("/proc/self/status", "r", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def scenario():
+    """
+    生成一次完整会话的操作步骤
+    :return: [(步骤名称, 操作函数), ...]，操作函数接收 AppTest 实例并执行一次重跑
+    """
+    steps = [("home", lambda at: at.run())]
+    for entry in catalog.load_index():
+        show = catalog.load_show(entry["id"])
+        show_id = show["id"]
+        steps.append((f"{show_id}:open", lambda at, i=show_id: at.button(key=i).click().run()))
+        steps.append((f"{show_id}:physics", lambda at, i=show_id: at.toggle(key=f"physics_{i}").set_value(True).run()))
+        if show.get("season_edges"):
+            first = next(iter(show["episodes"]))
+            steps.append((f"{show_id}:season_graph",
+                          lambda at, i=show_id, s=first: at.select_slider(key=f"graph_season_{i}").set_value(s).run()))
+        steps.append((f"{show_id}:all_seasons",
+                      lambda at, i=show_id: at.toggle(key=f"all_seasons_{i}").set_value(True).run()))
+        last = list(show["episodes"])[-1]
+        steps.append((f"{show_id}:one_season",
+                      lambda at, i=show_id: at.toggle(key=f"all_seasons_{i}").set_value(False).run()))
+        steps.append((f"{show_id}:pick_season",
+                      lambda at, i=show_id, s=last: at.radio(key=f"season_{i}").set_value(s).run()))
+        for idx, item in enumerate(show["quiz"]):
+            steps.append((f"{show_id}:quiz{idx + 1}", lambda at, i=show_id, n=idx, a=item["ans"]: (
+                at.radio(key=f"quiz_{i}_{n}").set_value(a),
+                next(b for b in at.button if b.label == "提交答案").click().run())[-1]))
+            steps.append((f"{show_id}:next{idx + 1}", lambda at, n=idx: at.button(key=f"next_{n}").click().run()))
+        steps.append((f"{show_id}:restart", lambda at: at.button(key="restart_quiz").click().run()))
+    steps.append(("home_again", lambda at: at.button(key="home_button").click().run()))
+    return steps
+
+
+def run_session(trace=False):
+    """
+    执行一次完整会话并逐步测量
+    :param trace: 是否用 tracemalloc 记录每步的分配峰值
+    :return: [{步骤指标}, ...]
+    :raises RuntimeError: 某一步的脚本抛出异常
+    """
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    results = []
+    for name, action in scenario():
+        _MESSAGES["bytes"] = _MESSAGES["count"] = 0
+        # 先回收上一步的垃圾，避免分代回收的停顿随机落在某一步上
+        gc.collect()
+        if trace:
+            tracemalloc.reset_peak()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        action(at)
+        wall = (time.perf_counter() - start) * 1000
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        row = {
+            "step": name,
+            "wall_ms": round(wall, 2),
+            "rss_kb": _rss_kb(),
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "alloc_blocks": sys.getallocatedblocks() - blocks,
+            "delta_bytes": _MESSAGES["bytes"],
+            "messages": _MESSAGES["count"],
+        }
+        if trace:
+            row["traced_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        results.append(row)
+    return results
+
+
+def aggregate(sessions):
+    """
+    合并多次会话的同名步骤：耗时取最小值（同 timeit，噪声只会让耗时变长），其余取中位数
+    :param sessions: run_session() 结果的列表
+    :return: [{步骤指标}, ...]
+    """
+    rows = []
+    for step_rows in zip(*sessions):
+        row = {"step": step_rows[0]["step"]}
+        for key in step_rows[0]:
+            if key == "wall_ms":
+                row[key] = min(r[key] for r in step_rows)
+            elif key != "step":
+                row[key] = statistics.median(r[key] for r in step_rows)
+        rows.append(row)
+    return rows
+
+
+def compare(current, baseline, threshold):
+    """
+    与基线比较
+    :param current: 本次的步骤指标列表（缺少的指标不比较）
+    :param baseline: 基线的步骤指标列表
+    :param threshold: 允许的相对增幅（如 0.25 表示 25%）
+    :return: 退化描述列表，为空表示没有退化
+    """
+    base = {row["step"]: row for row in baseline}
+    regressions = []
+    for row in current:
+        old = base.get(row["step"])
+        if old is None:
+            continue
+        for metric, floor in MIN_DELTA.items():
+            if metric not in row or metric not in old:
+                continue
+            diff = row[metric] - old[metric]
+            if diff > floor and diff > abs(old[metric]) * threshold:
+                regressions.append(f"{row['step']}: {metric} {old[metric]} -> {row[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app.py 无浏览器基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="测量的会话次数")
+    parser.add_argument("--threshold", type=float, default=0.25, help="判定退化的相对增幅")
+    parser.add_argument("--tracemalloc", action="store_true", help="记录每步的Python分配峰值（较慢）")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    args = parser.parse_args()
+
+    # 先跑一遍预热各级缓存，并等后台预热线程结束，测量的是稳定状态
+    run_session()
+    warmup.start().join()
+    if args.tracemalloc:
+        tracemalloc.start()
+    steps = aggregate([run_session(args.tracemalloc) for _ in range(args.repeat)])
+
+    import streamlit
+    result = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "totals": {
+            "wall_ms": round(sum(r["wall_ms"] for r in steps), 2),
+            "delta_bytes": sum(r["delta_bytes"] for r in steps),
+            "peak_rss_kb": max(r["peak_rss_kb"] for r in steps),
+        },
+        "steps": steps,
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"{'步骤':<32}{'耗时ms':>10}{'消息字节':>12}{'内存块':>10}{'RSS KB':>10}")
+    for row in steps:
+        print(f"{row['step']:<32}{row['wall_ms']:>10.1f}{row['delta_bytes']:>12.0f}"
+              f"{row['alloc_blocks']:>10.0f}{row['rss_kb']:>10.0f}")
+    print(f"合计 {result['totals']['wall_ms']:.0f} ms, {result['totals']['delta_bytes']} 字节, "
+          f"峰值RSS {result['totals']['peak_rss_kb'] // 1024} MB -> {out_path}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"基线已保存: {BASELINE_PATH}")
+        return 0
+    if not os.path.exists(BASELINE_PATH):
+        print("没有基线，使用 --save-baseline 生成")
+        return 0
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(steps + [{"step": "total", **result["totals"]}],
+                          baseline["steps"] + [{"step": "total", **baseline["totals"]}], args.threshold)
+    for line in regressions:
+        print(f"退化 {line}")
+    print("与基线相比没有退化" if not regressions else f"共 {len(regressions)} 项退化")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
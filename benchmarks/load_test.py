@@ -0,0 +1,467 @@
+"""
+并发会话压力测试
+
+启动一个本地 Streamlit 服务（或连接 --url 指定的已有服务），按阶梯逐级增加并发会话数，
+每个会话直接通过 /_stcore/stream 的 websocket 收发 BackMsg / ForwardMsg，
+像浏览器一样重放用户操作：
+
+    点击侧边栏剧集 -> 逐题选择答案、提交、下一题（片段重跑） -> 再玩一次 -> 回到首页
+
+每一级记录：
+- 吞吐量（每秒完成的重跑数）与各类操作的延迟分位数（从发出消息到收到 script_finished）
+- 服务进程的 CPU 占用和常驻内存（读取 /proc/<pid>，需与服务在同一台 Linux 机器上）
+- 会话全部断开后的内存，用于观察每个会话的内存增长与泄漏
+
+当吞吐量不再随并发增长（增幅低于 --knee）或 p95 延迟超过 --slo-ms 时，
+即认为单个服务进程已经饱和，前一级的并发数就是这个进程能承载的会话数。
+
+用法（在仓库根目录运行）：
+    python benchmarks/load_test.py                               # 默认阶梯 1,5,10,25,50,100,200
+    python benchmarks/load_test.py --levels 10,50,100 --duration 30 --think 1.0
+    python benchmarks/load_test.py --url ws://127.0.0.1:8501 --pid 12345
+
+压测客户端本身也要占用CPU；在单核机器上测得的饱和点偏低，
+条件允许时应在另一台机器上运行客户端（--url 指向服务，此时没有 --pid 就不统计服务端资源）。
+结果保存在 benchmarks/results/load-<时间>.json。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+from websockets.asyncio.client import connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+sys.path.insert(0, REPO_DIR)
+import catalog  # noqa: E402
+
+DEFAULT_LEVELS = "1,5,10,25,50,100,200"
+# 服务启动、单次重跑的最长等待时间（秒）
+STARTUP_TIMEOUT = 60
+RUN_TIMEOUT = 60
+# 服务端资源的采样间隔（秒）
+SAMPLE_INTERVAL = 0.5
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+_FINISHED_OK = (
+    ForwardMsg.FINISHED_SUCCESSFULLY,
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+)
+
+
+class ServerProcess:
+    """读取服务进程的 CPU 时间和常驻内存"""
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def cpu_seconds(self):
+        """
+        :return: 进程累计的用户态+内核态CPU时间（秒）
+        """
+        with open(f"/proc/{self.pid}/stat", "r", encoding="ascii") as f:
+            # 第二个字段（进程名）可能含空格，从最后一个右括号之后开始数
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def rss_kb(self):
+        """
+        :return: 当前常驻内存（千字节）
+        """
+        with open(f"/proc/{self.pid}/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE_KB
+
+
+def _free_port():
+    """
+    :return: 一个当前空闲的本地端口
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port):
+    """
+    在子进程中启动 app.py，等待健康检查通过
+    :param port: 监听端口
+    :return: subprocess.Popen 实例
+    :raises RuntimeError: 服务在 STARTUP_TIMEOUT 秒内没有就绪
+    """
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(REPO_DIR, "app.py"),
+         "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--server.headless", "true", "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(os.environ, TVAPP_PERF_LOG="0"),
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as resp:
+                if resp.status == 200:
+                    return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"服务在 {STARTUP_TIMEOUT} 秒内没有就绪")
+
+
+def percentile(values, q):
+    """
+    最近秩法求分位数
+    :param values: 已排序的数值列表
+    :param q: 分位（0~1）
+    :return: 分位数；列表为空时返回 None
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Session:
+    """一个模拟的浏览器会话"""
+
+    def __init__(self, url, stats):
+        """
+        :param url: 服务的 websocket 地址（不含路径）
+        :param stats: 本级的统计字典，各会话共享
+        """
+        self.url = url.rstrip("/") + "/_stcore/stream"
+        self.stats = stats
+        self.ws = None
+        self.page_hash = ""
+        # 用户 key 或按钮文字 -> (控件ID, 所属片段ID)
+        self.widgets = {}
+        # 控件ID -> 持久的控件值（单选等），每次重跑都要带上，和浏览器一致
+        self.values = {}
+
+    async def open(self):
+        """建立连接并完成首次运行"""
+        self.ws = await connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=RUN_TIMEOUT)
+        await self.rerun("connect")
+
+    async def close(self):
+        """关闭连接"""
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def rerun(self, action, trigger=None, value=None, fragment_id=""):
+        """
+        发送一次重跑请求并等待脚本结束
+        :param action: 操作名称（用于分类统计）
+        :param trigger: 本次触发的按钮ID
+        :param value: 本次修改的持久控件值 WidgetState
+        :param fragment_id: 片段内的控件只重跑所在片段
+        """
+        if value is not None:
+            self.values[value.id] = value
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.page_script_hash = self.page_hash
+        state.fragment_id = fragment_id
+        state.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            state.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        status = await asyncio.wait_for(self._until_finished(), RUN_TIMEOUT)
+        elapsed = (time.perf_counter() - start) * 1000
+        if status in _FINISHED_OK:
+            self.stats["latency"].setdefault(action, []).append(elapsed)
+        else:
+            self.stats["errors"] += 1
+
+    async def _until_finished(self):
+        """
+        接收消息直到本次脚本运行结束，同时登记页面中的控件
+        :return: script_finished 状态
+        """
+        while True:
+            raw = await self.ws.recv()
+            self.stats["bytes"] += len(raw)
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = msg.new_session.page_script_hash or msg.new_session.main_script_hash
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                self._register(msg.delta.new_element, msg.delta.fragment_id)
+            elif kind == "script_finished":
+                return msg.script_finished
+
+    def _register(self, element, fragment_id):
+        """
+        登记控件ID（ID 形如 $$ID-<哈希>-<用户key>；没有 key 的按钮按文字登记）
+        :param element: Element protobuf
+        :param fragment_id: 所属片段ID
+        """
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.stats["errors"] += 1
+            return
+        inner = getattr(element, kind)
+        if "id" not in inner.DESCRIPTOR.fields_by_name or not inner.id:
+            return
+        user_key = inner.id.split("-", 2)[-1]
+        if user_key != "None":
+            self.widgets[user_key] = (inner.id, fragment_id)
+        if kind == "button":
+            self.widgets[inner.label] = (inner.id, fragment_id)
+
+    async def click(self, action, key):
+        """
+        点击按钮
+        :param action: 操作名称
+        :param key: 按钮的用户 key 或文字
+        """
+        widget_id, fragment_id = self.widgets[key]
+        await self.rerun(action, trigger=widget_id, fragment_id=fragment_id)
+
+    async def choose(self, action, key, option):
+        """
+        在单选控件中选择一项
+        :param action: 操作名称
+        :param key: 单选控件的用户 key
+        :param option: 选项文字
+        """
+        widget_id, fragment_id = self.widgets[key]
+        await self.rerun(action, value=WidgetState(id=widget_id, string_value=option), fragment_id=fragment_id)
+
+
+async def user_journey(session, show, think):
+    """
+    一轮完整的用户操作：打开剧集、答完全部题目、再玩一次、回到首页
+    :param session: Session 实例
+    :param show: 剧集数据
+    :param think: 两次操作之间的平均思考时间（秒）
+    """
+    async def pause():
+        if think > 0:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * think)
+
+    show_id = show["id"]
+    await session.click("open_show", show_id)
+    for idx, item in enumerate(show["quiz"]):
+        await pause()
+        await session.choose("quiz_select", f"quiz_{show_id}_{idx}", item["ans"])
+        await pause()
+        await session.click("quiz_submit", "提交答案")
+        await pause()
+        await session.click("quiz_next", f"next_{idx}")
+    await pause()
+    await session.click("quiz_restart", "restart_quiz")
+    await pause()
+    await session.click("go_home", "home_button")
+
+
+async def warm_up(url, shows):
+    """
+    用一个会话把每部剧走一遍，填充服务端缓存，使第一级的数据不含冷启动开销
+    :param url: 服务的 websocket 地址
+    :param shows: 剧集数据列表
+    """
+    session = Session(url, {"latency": {}, "errors": 0, "bytes": 0})
+    await session.open()
+    try:
+        for show in shows:
+            await user_journey(session, show, 0)
+    finally:
+        await session.close()
+
+
+async def run_level(url, sessions, duration, think, shows, server):
+    """
+    以指定并发数运行一级压测
+    :param url: 服务的 websocket 地址
+    :param sessions: 并发会话数
+    :param duration: 本级持续时间（秒）
+    :param think: 平均思考时间（秒）
+    :param shows: 用户可能打开的剧集数据列表
+    :param server: ServerProcess 实例；为 None 时不统计服务端资源
+    :return: 本级结果字典
+    """
+    stats = {"latency": {}, "errors": 0, "bytes": 0}
+    samples = []
+
+    async def sample():
+        while True:
+            samples.append(server.rss_kb())
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    async def user(i, session):
+        # 错开各会话选择的剧集，避免所有会话同时访问同一个页面
+        turn = i
+        while time.monotonic() < stop_at:
+            await user_journey(session, shows[turn % len(shows)], think)
+            turn += 1
+
+    sampler = asyncio.create_task(sample()) if server else None
+    rss_before = server.rss_kb() if server else None
+    clients = [Session(url, stats) for _ in range(sessions)]
+    opened = await asyncio.gather(*(c.open() for c in clients), return_exceptions=True)
+    clients = [c for c, r in zip(clients, opened) if not isinstance(r, BaseException)]
+    stats["errors"] += sessions - len(clients)
+
+    cpu_start = server.cpu_seconds() if server else None
+    started = time.monotonic()
+    stop_at = started + duration
+    outcomes = await asyncio.gather(*(user(i, c) for i, c in enumerate(clients)), return_exceptions=True)
+    elapsed = time.monotonic() - started
+    cpu_used = server.cpu_seconds() - cpu_start if server else None
+    stats["errors"] += sum(isinstance(r, BaseException) for r in outcomes)
+    rss_loaded = server.rss_kb() if server else None
+
+    await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+    if sampler:
+        sampler.cancel()
+
+    connect_ms = sorted(stats["latency"].pop("connect", []))
+    actions = {name: sorted(values) for name, values in stats["latency"].items()}
+    everything = sorted(v for values in actions.values() for v in values)
+    result = {
+        "sessions": sessions,
+        "connected": len(clients),
+        "seconds": round(elapsed, 2),
+        "reruns": len(everything),
+        "throughput": round(len(everything) / elapsed, 2),
+        "p50_ms": _round(percentile(everything, 0.5)),
+        "p95_ms": _round(percentile(everything, 0.95)),
+        "p99_ms": _round(percentile(everything, 0.99)),
+        "connect_p95_ms": _round(percentile(connect_ms, 0.95)),
+        "errors": stats["errors"],
+        "received_mb": round(stats["bytes"] / 1024 / 1024, 2),
+        "actions": {name: {"count": len(values), "p50_ms": _round(percentile(values, 0.5)),
+                           "p95_ms": _round(percentile(values, 0.95))} for name, values in actions.items()},
+    }
+    if server:
+        result.update({
+            "cpu_percent": round(100 * cpu_used / elapsed, 1),
+            "rss_before_mb": round(rss_before / 1024, 1),
+            "rss_peak_mb": round(max(samples + [rss_loaded]) / 1024, 1),
+            "rss_per_session_kb": round((rss_loaded - rss_before) / max(1, len(clients))),
+        })
+    return result
+
+
+def _round(value):
+    """保留一位小数，None 原样返回"""
+    return None if value is None else round(value, 1)
+
+
+def find_saturation(levels, slo_ms, knee):
+    """
+    找出饱和点：吞吐量增幅低于 knee，或 p95 超过 slo_ms，或出现错误的第一级
+    :param levels: run_level() 结果列表（按并发数递增）
+    :param slo_ms: p95 延迟上限（毫秒）
+    :param knee: 吞吐量的最低相对增幅（如 0.1 表示 10%）
+    :return: (是否饱和, 最后一个健康级别的并发数或 None, 原因)；
+             未饱和时并发数是测试过的最高一级，说明单进程的承载能力至少为此
+    """
+    healthy = None
+    for prev, level in zip([None] + levels[:-1], levels):
+        if level["errors"]:
+            return True, healthy, f"{level['sessions']} 个会话时出现 {level['errors']} 个错误"
+        if level["p95_ms"] is not None and level["p95_ms"] > slo_ms:
+            return True, healthy, f"{level['sessions']} 个会话时 p95 {level['p95_ms']}ms 超过 {slo_ms}ms"
+        if prev is not None and level["throughput"] < prev["throughput"] * (1 + knee):
+            return True, healthy, f"{level['sessions']} 个会话时吞吐量 {level['throughput']}/s 不再增长"
+        healthy = level["sessions"]
+    return False, healthy, "测试的所有级别都未饱和"
+
+
+async def main_async(args):
+    shows = [catalog.load_show(entry["id"]) for entry in catalog.load_index()]
+    levels = [int(n) for n in args.levels.split(",")]
+
+    proc = None
+    url, pid = args.url, args.pid
+    if url is None:
+        port = _free_port()
+        proc = start_server(port)
+        url, pid = f"ws://127.0.0.1:{port}", proc.pid
+    server = ServerProcess(pid) if pid else None
+
+    results = []
+    try:
+        await warm_up(url, shows)
+        print(f"{'会话':>6}{'吞吐/s':>9}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'错误':>6}{'CPU%':>7}{'RSS MB':>9}{'KB/会话':>9}")
+        for sessions in levels:
+            level = await run_level(url, sessions, args.duration, args.think, shows, server)
+            results.append(level)
+            print(f"{level['sessions']:>6}{level['throughput']:>9}{level['p50_ms'] or '-':>9}"
+                  f"{level['p95_ms'] or '-':>9}{level['p99_ms'] or '-':>9}{level['errors']:>6}"
+                  f"{level.get('cpu_percent', '-'):>7}{level.get('rss_peak_mb', '-'):>9}"
+                  f"{level.get('rss_per_session_kb', '-'):>9}")
+            if server:
+                # 等待已断开会话的清理，下一级从相对干净的状态开始
+                await asyncio.sleep(args.cooldown)
+        rss_after = server.rss_kb() / 1024 if server else None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    saturated, saturation, reason = find_saturation(results, args.slo_ms, args.knee)
+    if not saturated:
+        print(f"在测试的并发级别内未达到饱和：最高 {saturation} 个会话仍然健康，"
+              f"承载能力至少为此，可用 --levels 加大并发继续测试")
+    elif saturation is None:
+        print(f"最低一级即已饱和（{reason}），可用 --levels 降低并发继续测试")
+    else:
+        print(f"饱和点: {saturation} 个会话/进程（{reason}）")
+    if rss_after is not None:
+        print(f"全部会话断开后服务内存 {rss_after:.1f} MB")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, "load-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {"time": datetime.now().isoformat(timespec="seconds"), "url": url,
+                     "duration": args.duration, "think": args.think, "cpus": os.cpu_count()},
+            "levels": results,
+            "saturation": {"reached": saturated, "sessions": saturation, "reason": reason},
+            "rss_after_mb": None if rss_after is None else round(rss_after, 1),
+        }, f, ensure_ascii=False, indent=2)
+    print(f"结果: {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发会话压力测试")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS, help="逗号分隔的并发会话数阶梯")
+    parser.add_argument("--duration", type=float, default=20, help="每一级的持续时间（秒）")
+    parser.add_argument("--think", type=float, default=0.5, help="两次操作之间的平均思考时间（秒），0 表示不停顿")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p95 延迟上限（毫秒）")
+    parser.add_argument("--knee", type=float, default=0.1, help="判定吞吐量不再增长的最低相对增幅")
+    parser.add_argument("--cooldown", type=float, default=2, help="两级之间的间隔（秒）")
+    parser.add_argument("--url", help="已有服务的 websocket 地址，如 ws://127.0.0.1:8501；不指定则启动本地服务")
+    parser.add_argument("--pid", type=int, help="与 --url 一起使用：服务进程ID，用于统计CPU和内存")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+剧集数据目录模块
+
+剧集数据保存在 data/shows/<剧集ID>.json 中，每部剧一个文件；
+data/index.json 是首页和侧边栏使用的轻量索引，只包含海报、类型、评分等字段。
+
+- load_index() 读取索引，供首页和侧边栏使用
+- load_index_page(page, page_size) 只取索引中的一页，首页按页渲染
+- load_show(show_id) 按需读取单部剧的完整数据
+- read_show(show_id) 不经缓存读取单部剧，供遍历全部剧集的一次性任务（如检索索引）使用，
+  避免所有剧集常驻内存
+
+前两者都按文件的修改时间缓存在进程内。新增或删除剧集只需增删 JSON 文件，
+下次访问时索引会自动重建；修改已有剧集的海报、评分等索引字段后，
+运行 python catalog.py 手动重建索引。
+
+缓存的数据由所有会话共享同一份，因此是只读的：字典为 MappingProxyType，
+列表为 tuple。会话需要修改时应先复制，会话自己的状态只放在 st.session_state 中。
+"""
+
+import json
+import os
+import threading
+from types import MappingProxyType
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+SHOWS_DIR = os.path.join(DATA_DIR, "shows")
+INDEX_PATH = os.path.join(DATA_DIR, "index.json")
+
+# 写入索引的字段（首页网格和侧边栏只需要这些）
+INDEX_FIELDS = ("id", "order", "title", "poster", "poster_url", "genre", "rates", "theme_color")
+
+# 缓存结构：路径 -> (mtime_ns, 文件大小, 数据)
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _file_key(file_path):
+    """
+    获取文件的版本标识（修改时间 + 大小）
+    :param file_path: 文件路径
+    :return: (mtime_ns, size) 元组
+    """
+    st = os.stat(file_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _freeze(value):
+    """
+    将JSON数据递归转换为只读结构
+    :param value: json.load 的结果
+    :return: 字典转为 MappingProxyType，列表转为 tuple，其他值原样返回
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _load_json(file_path):
+    """
+    读取JSON文件，文件未变化时直接返回缓存
+    :param file_path: JSON文件路径
+    :return: 解析后的只读数据（所有会话共享，不可修改）
+    :raises OSError: 文件不存在或无法读取
+    """
+    key = _file_key(file_path)
+    cached = _CACHE.get(file_path)
+    if cached is not None and cached[:2] == key:
+        return cached[2]
+
+    with _LOCK:
+        cached = _CACHE.get(file_path)
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = _freeze(json.load(f))
+        _CACHE[file_path] = (key[0], key[1], data)
+        return data
+
+
+def show_path(show_id):
+    """
+    获取剧集数据文件路径
+    :param show_id: 剧集ID
+    :return: JSON文件路径
+    """
+    return os.path.join(SHOWS_DIR, f"{show_id}.json")
+
+
+def build_index():
+    """
+    扫描 data/shows 目录，重新生成 data/index.json
+    :return: 索引条目列表
+    """
+    entries = []
+    for name in sorted(os.listdir(SHOWS_DIR)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(SHOWS_DIR, name), "r", encoding="utf-8") as f:
+            show = json.load(f)
+        entries.append({field: show[field] for field in INDEX_FIELDS if field in show})
+    # 按 order 字段排序，未指定的排在最后
+    entries.sort(key=lambda e: (e.get("order", float("inf")), e["id"]))
+
+    tmp_path = f"{INDEX_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"shows": entries}, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, INDEX_PATH)
+    return entries
+
+
+def _index_is_stale():
+    """
+    判断索引是否落后于剧集目录（目录中增删文件会更新目录的修改时间）
+    :return: 需要重建时返回 True
+    """
+    if not os.path.exists(INDEX_PATH):
+        return True
+    return os.stat(SHOWS_DIR).st_mtime_ns > os.stat(INDEX_PATH).st_mtime_ns
+
+
+def load_index():
+    """
+    读取剧集索引
+    :return: 只读的索引条目序列，每项包含 INDEX_FIELDS 中的字段
+    """
+    if _index_is_stale():
+        with _LOCK:
+            if _index_is_stale():
+                build_index()
+    return _load_json(INDEX_PATH)["shows"]
+
+
+def catalog_version():
+    """
+    获取剧集目录的版本标识，供依赖剧集数据的派生缓存（如检索索引）判断是否失效
+    :return: 索引文件的 (mtime_ns, size) 元组
+    """
+    load_index()
+    return _file_key(INDEX_PATH)
+
+
+def load_index_page(page, page_size):
+    """
+    读取剧集索引中的一页，每页的开销与剧集总数无关
+    :param page: 页码（从0开始），超出范围时自动截断到有效页
+    :param page_size: 每页剧集数量
+    :return: (当前页条目列表, 有效页码, 总页数) 元组
+    """
+    index = load_index()
+    page_count = max(1, -(-len(index) // page_size))
+    page = min(max(page, 0), page_count - 1)
+    start = page * page_size
+    return index[start:start + page_size], page, page_count
+
+
+def show_version(show_id):
+    """
+    获取单部剧集数据的版本标识，供按剧集缓存的派生数据判断是否失效
+    :param show_id: 剧集ID
+    :return: 剧集文件的 (mtime_ns, size) 元组
+    """
+    return _file_key(show_path(show_id))
+
+
+def load_show(show_id):
+    """
+    读取单部剧集的完整数据
+    :param show_id: 剧集ID
+    :return: 只读的剧集数据；剧集不存在时返回 None
+    """
+    if not show_id or os.sep in show_id or show_id.startswith("."):
+        return None
+    try:
+        return _load_json(show_path(show_id))
+    except FileNotFoundError:
+        return None
+
+
+def read_show(show_id):
+    """
+    不经缓存读取单部剧集的完整数据（已缓存时直接复用）
+    :param show_id: 剧集ID（来自索引）
+    :return: 剧集数据；剧集不存在时返回 None
+    """
+    file_path = show_path(show_id)
+    cached = _CACHE.get(file_path)
+    try:
+        if cached is not None and cached[:2] == _file_key(file_path):
+            return cached[2]
+        with open(file_path, "r", encoding="utf-8") as f:
+            return _freeze(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    for entry in build_index():
+        print(f"{entry['id']}: {entry['title']}")
@@ -0,0 +1,467 @@
+"""
+人物关系图模块
+
+streamlit_agraph 的 agraph() 每次调用都会重新构建 Node/Edge 并序列化成 JSON。
+这里按"剧集 + 关系图数据版本"缓存序列化后的组件参数，页面重跑时直接复用，
+并以固定的 key 调用组件，参数不变时前端不会重新布局。
+（只替换头像文件而不改动剧集数据时，需要重启服务才会生效。
+头像加载失败而退回占位图的参数不缓存，图片恢复后下次重跑即可显示。）
+
+节点坐标由服务端的力导向布局（Fruchterman-Reingold）预先计算，
+按关系图数据版本缓存到 .cache/graph 目录，浏览器端默认关闭物理引擎，
+打开页面时无需再做一遍力学模拟。
+
+大型演员表通过 GraphIndex（邻接表索引）只取一个有界的子图展示，
+支持 k 跳邻域、两人之间的最短关系链和按度数排序的核心人物查询。
+
+人物关系随剧情推进而变化：剧集数据的 "season_edges" 字段按季记录关系的增减
+（{"add": [[源, 目标, 关系], ...], "remove": [[源, 目标], ...]}，同一对人物再次
+add 表示关系改变），各季的关系图由这些差量依次累加得到。所有季共用全剧的节点坐标，
+且组件 key 不变，切换季时前端只增删有变化的节点和边，不会重新布局。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import streamlit_agraph
+from streamlit_agraph import Config, Edge, Node
+
+import perf
+import placeholders
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LAYOUT_DIR = os.path.join(BASE_DIR, ".cache", "graph")
+
+# 布局中相邻节点的理想距离（与边的 length 一致）
+EDGE_LENGTH = 250
+# 一次最多展示的节点数，超过时只展示子图
+MAX_VISIBLE = 60
+# 最多缓存的组件参数份数（每个子图一份）
+MAX_PAYLOADS = 256
+
+# 阵营配色（按阵营编号循环使用）
+COMMUNITY_COLORS = ["#F7A072", "#4FACFE", "#2ECC71", "#E74C3C", "#9B59B6", "#F1C40F", "#1ABC9C", "#E67E22"]
+
+# 剧集数据版本 -> 关系图数据版本，避免每次重跑都重新计算哈希
+_VERSIONS = {}
+# (剧集ID, 关系图数据版本, 背景色, 是否启用物理引擎, 可见节点, 是否带分析结果, 季, 图片标识) -> (data_json, config_json)
+_PAYLOADS = OrderedDict()
+# (剧集ID, 关系图数据版本) -> GraphIndex
+_INDEXES = {}
+# (剧集ID, 关系图数据版本) -> {节点ID: (x, y)}
+_LAYOUTS = {}
+# 剧集ID -> (剧集数据版本, {季名: SeasonGraph})
+_SEASONS = {}
+# 剧集ID -> 计算布局时持有的锁（同一部剧只由一个线程计算）
+_LAYOUT_LOCKS = {}
+_LOCK = threading.Lock()
+
+
+def graph_version(show, show_version):
+    """
+    计算关系图数据（节点和边）的内容版本，只有节点或边变化时才会改变
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :return: 版本字符串
+    """
+    cached = _VERSIONS.get(show["id"])
+    if cached is not None and cached[0] == show_version:
+        return cached[1]
+    raw = json.dumps([show["nodes"], show["edges"]], ensure_ascii=False, sort_keys=True)
+    version = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    _VERSIONS[show["id"]] = (show_version, version)
+    return version
+
+
+class GraphIndex:
+    """
+    关系图的邻接表索引（按无向图处理），用于大型演员表的局部查询
+    """
+
+    def __init__(self, nodes, edges):
+        """
+        :param nodes: (节点ID, 头像路径) 列表
+        :param edges: (源节点, 目标节点, 关系) 列表
+        """
+        self.node_ids = [n_id for n_id, _ in nodes]
+        self.edges = [tuple(e) for e in edges]
+        # 节点 -> {相邻节点: 关系}
+        self.adj = {n_id: {} for n_id in self.node_ids}
+        for src, tgt, lbl in self.edges:
+            if src in self.adj and tgt in self.adj and src != tgt:
+                self.adj[src].setdefault(tgt, lbl)
+                self.adj[tgt].setdefault(src, lbl)
+        self.by_degree = sorted(self.node_ids, key=lambda n: (-len(self.adj[n]), n))
+
+    def expand(self, seeds, k=1, limit=None):
+        """
+        从若干起点出发做广度优先搜索，返回 k 跳以内的节点
+        :param seeds: 起点节点ID列表
+        :param k: 最大跳数
+        :param limit: 最多返回的节点数，None 表示不限
+        :return: 按发现顺序排列的节点ID列表（起点在前）
+        """
+        seen = {}
+        queue = deque()
+        for seed in seeds:
+            if seed in self.adj and seed not in seen:
+                seen[seed] = 0
+                queue.append(seed)
+        while queue:
+            if limit is not None and len(seen) >= limit:
+                break
+            node = queue.popleft()
+            if seen[node] >= k:
+                continue
+            for neighbor in self.adj[node]:
+                if neighbor not in seen:
+                    seen[neighbor] = seen[node] + 1
+                    queue.append(neighbor)
+                    if limit is not None and len(seen) >= limit:
+                        break
+        return list(seen)
+
+    def neighborhood(self, center, k=1, limit=None):
+        """
+        获取某个人物 k 跳以内的邻域
+        :param center: 中心节点ID
+        :param k: 最大跳数
+        :param limit: 最多返回的节点数
+        :return: 节点ID列表
+        """
+        return self.expand([center], k, limit)
+
+    def shortest_path(self, source, target):
+        """
+        两个人物之间的最短关系链
+        :param source: 起点节点ID
+        :param target: 终点节点ID
+        :return: [(节点ID, 与下一个节点的关系), ..., (终点ID, None)]；不连通时返回 None
+        """
+        if source not in self.adj or target not in self.adj:
+            return None
+        parents = {source: None}
+        queue = deque([source])
+        while queue and target not in parents:
+            node = queue.popleft()
+            for neighbor in self.adj[node]:
+                if neighbor not in parents:
+                    parents[neighbor] = node
+                    queue.append(neighbor)
+        if target not in parents:
+            return None
+        path = [target]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return [(node, self.adj[node][nxt]) for node, nxt in zip(path, path[1:])] + [(target, None)]
+
+    def top_central(self, n=10):
+        """
+        按关系数量（度数）排序的核心人物
+        :param n: 返回数量
+        :return: 节点ID列表
+        """
+        return self.by_degree[:n]
+
+    def subgraph_edges(self, visible):
+        """
+        获取两端都在可见节点集合中的边
+        :param visible: 可见节点ID集合
+        :return: 边列表
+        """
+        return [e for e in self.edges if e[0] in visible and e[1] in visible]
+
+
+def graph_index(show, show_version):
+    """
+    获取剧集关系图的邻接表索引，关系图数据不变时复用
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :return: GraphIndex 实例
+    """
+    key = (show["id"], graph_version(show, show_version))
+    with _LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = GraphIndex(show["nodes"], show["edges"])
+            for old in [k for k in _INDEXES if k[0] == show["id"]]:
+                del _INDEXES[old]
+            _INDEXES[key] = index
+    return index
+
+
+class SeasonGraph:
+    """
+    某一季结束时的关系图快照，以及相对上一季的变化
+    """
+
+    def __init__(self, edges, added, removed):
+        """
+        :param edges: 本季的 (源节点, 目标节点, 关系) 列表
+        :param added: 本季新增或改变的关系
+        :param removed: 本季结束或被替换的关系
+        """
+        self.edges = edges
+        self.added = added
+        self.removed = removed
+        self.nodes = {n for src, tgt, _ in edges for n in (src, tgt)}
+
+
+def build_season_graphs(show):
+    """
+    按季依次应用关系差量，得到每一季的关系图
+    :param show: 剧集数据
+    :return: {季名: SeasonGraph}，按 episodes 中的季顺序排列；没有 season_edges 时为空字典
+    """
+    diffs = show.get("season_edges")
+    if not diffs:
+        return {}
+    current = {}
+    seasons = {}
+    for season in show.get("episodes", {}):
+        diff = diffs.get(season, {})
+        previous = dict(current)
+        for src, tgt in diff.get("remove", []):
+            current.pop(frozenset((src, tgt)), None)
+        for src, tgt, lbl in diff.get("add", []):
+            current[frozenset((src, tgt))] = (src, tgt, lbl)
+        added = [e for key, e in current.items() if previous.get(key) != e]
+        removed = [e for key, e in previous.items() if current.get(key) != e]
+        seasons[season] = SeasonGraph(list(current.values()), added, removed)
+    return seasons
+
+
+def season_graphs(show, show_version):
+    """
+    获取各季的关系图，剧集数据不变时复用
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :return: {季名: SeasonGraph}
+    """
+    cached = _SEASONS.get(show["id"])
+    if cached is None or cached[0] != show_version:
+        cached = (show_version, build_season_graphs(show))
+        _SEASONS[show["id"]] = cached
+    return cached[1]
+
+
+def compute_layout(node_ids, edges, iterations=200, k=EDGE_LENGTH, gravity=0.02):
+    """
+    力导向布局（Fruchterman-Reingold）：节点间相互排斥，有边的节点相互吸引
+    :param node_ids: 节点ID列表
+    :param edges: (源节点, 目标节点, 关系) 列表
+    :param iterations: 迭代次数
+    :param k: 相邻节点的理想距离
+    :param gravity: 向中心的引力系数，防止不连通的部分漂得太远
+    :return: {节点ID: (x, y)} 字典
+    """
+    n = len(node_ids)
+    if n == 0:
+        return {}
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = np.array([(index[s], index[t]) for s, t, _ in edges if s in index and t in index and s != t],
+                     dtype=int).reshape(-1, 2)
+
+    # 初始位置均匀分布在圆周上，保证结果可复现
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    radius = k * max(1.0, np.sqrt(n) / 2)
+    pos = np.column_stack([np.cos(angles), np.sin(angles)]) * radius
+    temperature = radius / 2
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        # 斥力：k^2 / d
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist = np.linalg.norm(delta, axis=-1)
+        np.fill_diagonal(dist, 1.0)
+        dist = np.maximum(dist, 0.01)
+        disp = (delta * (k * k / dist ** 2)[:, :, None]).sum(axis=1)
+        # 引力：d^2 / k
+        if len(pairs):
+            d = pos[pairs[:, 0]] - pos[pairs[:, 1]]
+            length = np.maximum(np.linalg.norm(d, axis=-1), 0.01)
+            force = d * (length / k)[:, None]
+            np.add.at(disp, pairs[:, 0], -force)
+            np.add.at(disp, pairs[:, 1], force)
+        disp -= pos * gravity
+        # 单步位移不超过当前温度
+        length = np.maximum(np.linalg.norm(disp, axis=-1), 0.01)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    return {node_id: (int(round(x)), int(round(y))) for node_id, (x, y) in zip(node_ids, pos)}
+
+
+def graph_layout(show, show_version):
+    """
+    获取节点坐标，先查内存，再查磁盘缓存，都没有时计算并写入磁盘。
+    同一部剧的布局只由一个线程计算，其他线程等待后直接使用结果
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :return: {节点ID: (x, y)} 字典
+    """
+    version = graph_version(show, show_version)
+    key = (show["id"], version)
+    layout = _LAYOUTS.get(key)
+    if layout is not None:
+        return layout
+
+    with _LOCK:
+        show_lock = _LAYOUT_LOCKS.setdefault(show["id"], threading.Lock())
+    with show_lock:
+        layout = _LAYOUTS.get(key)
+        if layout is not None:
+            return layout
+        path = os.path.join(LAYOUT_DIR, f"{show['id']}-{version}.layout.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                layout = {node_id: tuple(xy) for node_id, xy in json.load(f).items()}
+        except (OSError, ValueError):
+            layout = compute_layout([n_id for n_id, _ in show["nodes"]], show["edges"])
+            os.makedirs(LAYOUT_DIR, exist_ok=True)
+            # 临时文件名带上进程和线程ID，多个工作进程同时写入同一布局时互不覆盖
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(layout, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        _LAYOUTS[key] = layout
+    return layout
+
+
+def build_payload(show, image_for, background, layout=None, visible=None, stats=None):
+    """
+    构建关系图组件参数
+    :param show: 剧集数据
+    :param image_for: 根据头像路径返回图片地址的函数
+    :param background: 关系图背景色
+    :param layout: {节点ID: (x, y)} 固定坐标；为 None 时由浏览器端物理引擎布局
+    :param visible: 只展示这些节点及其之间的边，None 表示展示全图
+    :param stats: 网络分析结果（见 analytics.py），用于按重要程度设置节点大小、按阵营着色
+    :return: (data_json, config_json) 元组
+    """
+    importance = {}
+    if stats:
+        importance = {n: stats["degree"][n] + stats["betweenness"][n] for n in stats["degree"]}
+        top = max(importance.values(), default=0) or 1
+        importance = {n: v / top for n, v in importance.items()}
+
+    nodes = []
+    for n_id, n_img in show["nodes"]:
+        if visible is not None and n_id not in visible:
+            continue
+        node = Node(id=n_id, label=n_id, size=30, shape="circularImage", image=image_for(n_img))
+        if layout is not None and n_id in layout:
+            node.x, node.y = layout[n_id]
+        if n_id in importance:
+            node.size = 20 + round(20 * importance[n_id])
+            node.color = COMMUNITY_COLORS[stats["community"][n_id] % len(COMMUNITY_COLORS)]
+            node.borderWidth = 3
+        nodes.append(node)
+    edges = [
+        Edge(source=src, target=tgt, label=lbl, color="#bdc3c7", length=250)
+        for src, tgt, lbl in show["edges"]
+        if visible is None or (src in visible and tgt in visible)
+    ]
+    config = Config(
+        width="100%",
+        height=600,
+        directed=True,
+        physics=layout is None,
+        nodeHighlightBehavior=True,
+        highlightColor="#F7A072",
+        collapsible=False
+    )
+    config.background = background
+    data = {"nodes": [n.to_dict() for n in nodes], "edges": [e.to_dict() for e in edges]}
+    return json.dumps(data), json.dumps(config.to_dict())
+
+
+def graph_payload(show, show_version, image_for, background, physics=False, visible=None, stats=None,
+                  season=None, image_key=None):
+    """
+    获取缓存的关系图组件参数，关系图数据不变时不会重新构建和序列化（含占位头像的参数不缓存）
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :param image_for: 根据头像路径返回图片地址的函数
+    :param background: 关系图背景色
+    :param physics: 是否改用浏览器端物理引擎布局（默认使用预计算的固定坐标）
+    :param visible: 只展示这些节点，None 表示展示全图
+    :param stats: 网络分析结果（与关系图数据版本一一对应）
+    :param season: 只展示该季结束时的关系，None 表示全剧
+    :param image_key: image_for 返回值的区分标识（如图片格式），不同标识的参数分别缓存
+    :return: (data_json, config_json) 元组
+    """
+    visible = frozenset(visible) if visible is not None else None
+    key = (show["id"], graph_version(show, show_version), background, physics, visible, stats is not None, season,
+           image_key)
+    with _LOCK:
+        payload = _PAYLOADS.get(key)
+        if payload is not None:
+            _PAYLOADS.move_to_end(key)
+            return payload
+    # 各季沿用全剧的节点坐标，切换季时人物位置保持不变
+    layout = None if physics else graph_layout(show, show_version)
+    view = show
+    snapshot = season_graphs(show, show_version).get(season) if season is not None else None
+    if snapshot is not None:
+        view = dict(show, edges=snapshot.edges)
+        visible = snapshot.nodes if visible is None else visible & snapshot.nodes
+    fallbacks = []
+
+    def image(path):
+        src = image_for(path)
+        if placeholders.is_placeholder(src):
+            fallbacks.append(path)
+        return src
+
+    payload = build_payload(view, image, background, layout, visible, stats)
+    if fallbacks:
+        # 有头像退回了占位图：不缓存，否则在关系图数据版本不变期间会一直显示占位图
+        return payload
+    with _LOCK:
+        _PAYLOADS[key] = payload
+        while len(_PAYLOADS) > MAX_PAYLOADS:
+            _PAYLOADS.popitem(last=False)
+    return payload
+
+
+def component_key(show_id):
+    """
+    获取关系图组件的 key，被点击的节点ID保存在 st.session_state[key] 中
+    :param show_id: 剧集ID
+    :return: 组件 key
+    """
+    return f"agraph_{show_id}"
+
+
+def render(show, show_version, image_for, background, physics=False, visible=None, stats=None, season=None,
+           image_key=None, on_click=None):
+    """
+    绘制人物关系图
+    :param show: 剧集数据
+    :param show_version: 剧集数据文件版本（catalog.show_version）
+    :param image_for: 根据头像路径返回图片地址的函数
+    :param background: 关系图背景色
+    :param physics: 是否改用浏览器端物理引擎布局
+    :param visible: 只展示这些节点，None 表示展示全图
+    :param stats: 网络分析结果，用于节点大小和配色
+    :param season: 只展示该季结束时的关系，None 表示全剧
+    :param image_key: image_for 返回值的区分标识（如图片格式）
+    :param on_click: 点击节点时的回调
+    :return: 组件返回值（被点击的节点ID）
+    """
+    data_json, config_json = graph_payload(
+        show, show_version, image_for, background, physics, visible, stats, season, image_key
+    )
+    perf.track_bytes("agraph", len(data_json) + len(config_json))
+    # 固定 key 让组件实例在重跑之间保持不变，参数相同时前端无需重新布局，
+    # 切换季时也只会增删有变化的节点和边
+    return streamlit_agraph._agraph(
+        data=data_json, config=config_json, key=component_key(show["id"]), on_change=on_click
+    )
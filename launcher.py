@@ -0,0 +1,398 @@
+"""
+多进程部署启动器
+
+单个 Python 进程受 GIL 限制只能用满一个CPU核。启动器在连续端口上启动 N 个
+`streamlit run app.py` 工作进程，并在前面放一个本地反向代理：
+
+- 会话粘滞：首次请求时下发 tvapp_worker cookie（随机客户端ID），之后按 cookie
+  在健康的工作进程中做最高随机权重哈希（rendezvous hashing），同一浏览器的页面、
+  媒体文件和 websocket 始终落到同一个进程；某个进程下线时只有它的客户端被迁移
+- 支持 websocket：转发请求头后双向透传字节，升级后的长连接一直固定在同一个进程
+- 健康检查：定期请求每个进程的 /_stcore/health，连续失败或进程退出时重启
+  （重启间隔指数退避），恢复前其客户端由其他进程接管
+- 所有进程共用同一个 cookieSecret，迁移后的 XSRF 校验依然有效
+- 静态图片缓存：/app/static/assets/ 下的文件以内容哈希命名（见 assets.static_url），
+  代理为其响应加上 Cache-Control: public, max-age=31536000, immutable
+  （Streamlit 的静态文件服务只返回 ETag / Last-Modified）。普通HTTP请求转发时改为
+  Connection: close，每个请求单独一条连接，代理才能逐个检查请求路径并改写响应头
+
+用法（在仓库根目录运行）：
+    python launcher.py                       # 每个CPU核一个进程，代理监听 8501
+    python launcher.py --workers 4 --port 8080
+
+各工作进程的输出写入 logs/worker-<序号>.log。Ctrl+C 或 SIGTERM 时依次停止代理和全部进程。
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+from http.cookies import CookieError, SimpleCookie
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+
+COOKIE_NAME = "tvapp_worker"
+# 健康检查的间隔、单次超时（秒）与判定失败的连续次数
+HEALTH_INTERVAL = 5
+HEALTH_TIMEOUT = 2
+HEALTH_FAILURES = 3
+# 新启动的进程在此时间内不做失败判定（导入模块、预热需要时间）
+STARTUP_GRACE = 30
+# 重启的退避上限（秒）
+MAX_BACKOFF = 30
+# 停止时等待进程退出的时间，超时后强制结束
+STOP_TIMEOUT = 10
+# 请求头的大小上限
+MAX_HEAD = 64 * 1024
+CHUNK = 64 * 1024
+# 内容哈希命名的静态图片的URL前缀（与 assets.STATIC_URL_PREFIX 一致）及其缓存头
+IMMUTABLE_PREFIX = os.environ.get("TVAPP_STATIC_URL_PREFIX", "/app/static/assets").rstrip("/") + "/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class Worker:
+    """一个 streamlit 工作进程"""
+
+    def __init__(self, index, port, cookie_secret):
+        """
+        :param index: 进程序号
+        :param port: 监听端口
+        :param cookie_secret: 所有进程共用的 cookie 签名密钥
+        """
+        self.index = index
+        self.port = port
+        self.cookie_secret = cookie_secret
+        self.proc = None
+        self.healthy = False
+        self.failures = 0
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff = 1
+        self.retry_at = 0.0
+        self.connections = 0
+
+    def start(self):
+        """启动进程，输出追加到 logs/worker-<序号>.log（直接写文件，不经过管道）"""
+        os.makedirs(LOG_DIR, exist_ok=True)
+        with open(os.path.join(LOG_DIR, f"worker-{self.index}.log"), "ab") as log:
+            self.proc = subprocess.Popen(
+                [sys.executable, "-m", "streamlit", "run", os.path.join(BASE_DIR, "app.py"),
+                 "--server.port", str(self.port), "--server.address", "127.0.0.1",
+                 "--server.headless", "true", "--server.fileWatcherType", "none",
+                 "--browser.gatherUsageStats", "false"],
+                cwd=BASE_DIR, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                # cookieSecret 只能通过配置文件或环境变量设置
+                env=dict(os.environ, STREAMLIT_SERVER_COOKIE_SECRET=self.cookie_secret),
+            )
+        self.healthy = False
+        self.failures = 0
+        self.started_at = time.monotonic()
+
+    def alive(self):
+        """
+        :return: 进程是否仍在运行
+        """
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        先请求退出，超时后强制结束
+        :param timeout: 等待退出的时间（秒）
+        """
+        self.healthy = False
+        if not self.alive():
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class Pool:
+    """工作进程池：按客户端ID选择进程，并负责健康检查和重启"""
+
+    def __init__(self, count, base_port):
+        """
+        :param count: 进程数
+        :param base_port: 第一个进程的端口，其余依次加一
+        """
+        cookie_secret = secrets.token_hex(32)
+        self.workers = [Worker(i, base_port + i, cookie_secret) for i in range(count)]
+
+    def pick(self, client_id):
+        """
+        为客户端选择一个健康的进程（最高随机权重哈希，进程上下线时只影响其自身的客户端）
+        :param client_id: 客户端ID
+        :return: Worker 实例；没有健康进程时返回 None
+        """
+        healthy = [w for w in self.workers if w.healthy]
+        if not healthy:
+            return None
+        return max(healthy, key=lambda w: hashlib.sha1(f"{client_id}:{w.index}".encode()).digest())
+
+    async def supervise(self):
+        """健康检查循环：有进程未就绪时每 0.5 秒检查一次，否则每 HEALTH_INTERVAL 秒一次"""
+        while True:
+            now = time.monotonic()
+            for worker in self.workers:
+                if not worker.alive():
+                    if worker.healthy or worker.proc is not None:
+                        print(f"工作进程 {worker.index} 已退出，{worker.backoff}s 后重启", flush=True)
+                        worker.healthy = False
+                        worker.proc = None
+                        worker.retry_at = now + worker.backoff
+                    if now >= worker.retry_at:
+                        self._restart(worker)
+                    continue
+                if await probe(worker.port):
+                    if not worker.healthy:
+                        print(f"工作进程 {worker.index} 就绪: 127.0.0.1:{worker.port}", flush=True)
+                    worker.healthy = True
+                    worker.failures = 0
+                    worker.backoff = 1
+                    continue
+                worker.failures += 1
+                in_grace = not worker.healthy and now - worker.started_at < STARTUP_GRACE
+                if worker.failures >= HEALTH_FAILURES and not in_grace:
+                    print(f"工作进程 {worker.index} 连续 {worker.failures} 次健康检查失败，重启", flush=True)
+                    await asyncio.get_running_loop().run_in_executor(None, worker.stop)
+                    worker.proc = None
+                    worker.retry_at = now + worker.backoff
+            pending = any(not w.healthy for w in self.workers)
+            await asyncio.sleep(0.5 if pending else HEALTH_INTERVAL)
+
+    def _restart(self, worker):
+        """
+        启动（或重启）进程，并加倍下一次的退避时间
+        :param worker: Worker 实例
+        """
+        if worker.started_at:
+            worker.restarts += 1
+        worker.start()
+        worker.backoff = min(MAX_BACKOFF, worker.backoff * 2)
+
+    def stop(self):
+        """请求全部进程退出，在 STOP_TIMEOUT 内等待，超时的强制结束"""
+        for worker in self.workers:
+            if worker.alive():
+                worker.proc.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for worker in self.workers:
+            worker.stop(timeout=max(0.1, deadline - time.monotonic()))
+
+
+async def probe(port, timeout=HEALTH_TIMEOUT):
+    """
+    请求工作进程的健康检查接口
+    :param port: 端口
+    :param timeout: 超时（秒）
+    :return: 是否返回 200
+    """
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+        writer.write(b"GET /_stcore/health HTTP/1.0\r\nHost: 127.0.0.1\r\n\r\n")
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        return status.split()[1:2] == [b"200"]
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def client_id_from(head):
+    """
+    从请求头的 Cookie 中取出客户端ID
+    :param head: 原始请求头（bytes）
+    :return: 客户端ID；没有时返回 None
+    """
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() != b"cookie":
+            continue
+        try:
+            cookie = SimpleCookie(value.decode("latin-1"))
+        except CookieError:
+            continue
+        if COOKIE_NAME in cookie:
+            return cookie[COOKIE_NAME].value
+    return None
+
+
+def _header_name(line):
+    """
+    取出一行请求头/响应头的名称
+    :param line: 原始头部行（bytes）
+    :return: 小写的名称
+    """
+    return line.partition(b":")[0].strip().lower()
+
+
+def prepare_request(head):
+    """
+    解析请求行；普通HTTP请求改为 Connection: close，websocket 升级请求原样转发
+    :param head: 原始请求头（bytes，以空行结尾）
+    :return: (请求路径（不含查询串）, 是否为 websocket 升级, 转发给后端的请求头)
+    """
+    lines = head[:-4].split(b"\r\n")
+    parts = lines[0].split(b" ")
+    path = parts[1].decode("latin-1").partition("?")[0] if len(parts) > 1 else ""
+    if any(_header_name(line) == b"upgrade" for line in lines[1:]):
+        return path, True, head
+    kept = [line for line in lines[1:] if _header_name(line) not in (b"connection", b"keep-alive")]
+    return path, False, b"\r\n".join([lines[0]] + kept + [b"Connection: close"]) + b"\r\n\r\n"
+
+
+def rewrite_response(head, set_cookie=None, cache_control=None):
+    """
+    改写后端的响应头
+    :param head: 原始响应头（bytes，以空行结尾）
+    :param set_cookie: 要加入的 Set-Cookie 值；为 None 时不加
+    :param cache_control: 替换成功响应（200/304）的 Cache-Control；为 None 时不改
+    :return: 改写后的响应头
+    """
+    lines = head[:-4].split(b"\r\n")
+    status = lines[0].split(b" ")[1:2]
+    if cache_control is not None and status in ([b"200"], [b"304"]):
+        lines = [lines[0]] + [line for line in lines[1:] if _header_name(line) != b"cache-control"]
+        lines.append(b"Cache-Control: " + cache_control.encode("latin-1"))
+    if set_cookie is not None:
+        lines.append(b"Set-Cookie: " + set_cookie.encode("latin-1"))
+    return b"\r\n".join(lines) + b"\r\n\r\n"
+
+
+async def _pipe(reader, writer):
+    """
+    单向透传字节直到对端关闭
+    :param reader: 来源
+    :param writer: 去向
+    """
+    try:
+        while True:
+            data = await reader.read(CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _pipe_response(reader, writer, set_cookie, cache_control=None):
+    """
+    透传后端响应；需要时改写第一个响应头（见 rewrite_response）
+    :param reader: 后端连接
+    :param writer: 客户端连接
+    :param set_cookie: 新客户端要加入的 Set-Cookie 值；为 None 时不加
+    :param cache_control: 要设置的 Cache-Control；为 None 时不改
+    """
+    if set_cookie is not None or cache_control is not None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        writer.write(rewrite_response(head, set_cookie, cache_control))
+    await _pipe(reader, writer)
+
+
+def _reply(writer, status):
+    """
+    直接回复一个错误状态并关闭连接
+    :param writer: 客户端连接
+    :param status: 状态行，如 "503 Service Unavailable"
+    """
+    body = status.encode()
+    writer.write(b"HTTP/1.1 " + body + b"\r\nContent-Type: text/plain\r\nContent-Length: "
+                 + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+    writer.close()
+
+
+def make_handler(pool):
+    """
+    创建代理的连接处理函数
+    :param pool: Pool 实例
+    :return: asyncio.start_server 使用的回调
+    """
+    async def handle(client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        path, _, head = prepare_request(head)
+        cache_control = IMMUTABLE_CACHE_CONTROL if path.startswith(IMMUTABLE_PREFIX) else None
+        client_id = client_id_from(head)
+        set_cookie = None
+        if client_id is None:
+            client_id = secrets.token_hex(8)
+            set_cookie = f"{COOKIE_NAME}={client_id}; Path=/; HttpOnly; SameSite=Lax"
+        worker = pool.pick(client_id)
+        if worker is None:
+            _reply(client_writer, "503 Service Unavailable")
+            return
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+        except OSError:
+            _reply(client_writer, "502 Bad Gateway")
+            return
+
+        worker.connections += 1
+        try:
+            upstream_writer.write(head)
+            await asyncio.gather(
+                _pipe(client_reader, upstream_writer),
+                _pipe_response(upstream_reader, client_writer, set_cookie, cache_control),
+            )
+        finally:
+            worker.connections -= 1
+
+    return handle
+
+
+async def serve(workers, port, host):
+    """
+    启动工作进程和代理，直到收到退出信号
+    :param workers: 工作进程数
+    :param port: 代理监听端口（工作进程使用其后的连续端口）
+    :param host: 代理监听地址
+    """
+    pool = Pool(workers, port + 1)
+    supervisor = asyncio.create_task(pool.supervise())
+    server = await asyncio.start_server(make_handler(pool), host, port, limit=MAX_HEAD)
+    print(f"代理监听 http://{host}:{port}，{workers} 个工作进程（端口 {port + 1}-{port + workers}）", flush=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        print("正在停止代理和工作进程...", flush=True)
+        server.close()
+        supervisor.cancel()
+        await loop.run_in_executor(None, pool.stop)
+        status = ", ".join(f"#{w.index} 重启 {w.restarts} 次" for w in pool.workers)
+        print(f"已停止（{status}）", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多进程部署启动器")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数（默认每个CPU核一个）")
+    parser.add_argument("--port", type=int, default=8501, help="代理监听端口")
+    parser.add_argument("--host", default="0.0.0.0", help="代理监听地址")
+    args = parser.parse_args()
+    asyncio.run(serve(args.workers, args.port, args.host))
@@ -0,0 +1,238 @@
+"""
+性能埋点模块
+
+按阶段记录每次重跑的耗时和发往浏览器的数据量：
+
+    perf.start_run()
+    with perf.span("banner"):
+        ...
+    @perf.timed("quiz")
+    def render_quiz(data): ...
+    perf.track_bytes("banner", len(src))
+    perf.finish_run(page="stranger_things")
+
+finish_run() 把本次重跑的各阶段耗时写成一行 JSON（logs/perf.log，按大小轮转），
+并计入进程内的滑动窗口，供调试面板显示各阶段的 p50 / p95。
+片段（st.fragment）单独重跑时没有 start_run()，其中最外层的 span 各自记为一条记录。
+
+各阶段记录的是自身耗时：嵌套的阶段（如 agraph 中的 assets）从外层阶段中扣除，
+因此各阶段之和不超过 total（整次重跑的耗时，包括未埋点的部分）。
+重跑被 st.rerun() 或新的交互打断时 finish_run() 不会执行，残留的记录在下一次
+start_run() 或片段重跑时丢弃，不会混入下一次重跑。
+
+环境变量 TVAPP_PERF_LOG=0 关闭日志文件（滑动窗口仍然统计）。
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+LOG_PATH = os.path.join(LOG_DIR, "perf.log")
+LOG_ENABLED = os.environ.get("TVAPP_PERF_LOG", "1") != "0"
+# 单个日志文件的大小上限与保留的历史文件数
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# 每个阶段保留最近多少次耗时用于计算分位数
+WINDOW = 500
+
+# 阶段名称 -> 最近的耗时（毫秒）/ 数据量（字节）
+_DURATIONS = {}
+_BYTES = {}
+_LOCK = threading.Lock()
+# 每个脚本线程各自的当前重跑记录和进行中的阶段栈（不同会话的重跑在不同线程中执行）
+_LOCAL = threading.local()
+_STATE = {"logger": None}
+
+
+def _logger():
+    """
+    获取写入 logs/perf.log 的日志器（首次使用时配置）
+    :return: logging.Logger 实例
+    """
+    if _STATE["logger"] is None:
+        with _LOCK:
+            if _STATE["logger"] is None:
+                logger = logging.getLogger("tvapp.perf")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                os.makedirs(LOG_DIR, exist_ok=True)
+                handler = RotatingFileHandler(
+                    LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                _STATE["logger"] = logger
+    return _STATE["logger"]
+
+
+def _record(window, name, value):
+    """
+    将一个数值计入指定阶段的滑动窗口
+    :param window: _DURATIONS 或 _BYTES
+    :param name: 阶段名称
+    :param value: 数值
+    """
+    with _LOCK:
+        window.setdefault(name, deque(maxlen=WINDOW)).append(value)
+
+
+def start_run():
+    """开始记录一次完整的脚本重跑（丢弃上一次被打断、没有结束的记录）"""
+    _LOCAL.run = {"started": time.perf_counter(), "spans": {}, "bytes": {}}
+    _LOCAL.stack = []
+
+
+def _fragment_rerun():
+    """
+    判断当前是否是片段单独重跑
+    :return: 是片段重跑时返回 True；不在脚本线程中时返回 False
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return bool(ctx is not None and ctx.fragment_ids_this_run)
+
+
+def _emit(run, **tags):
+    """
+    写出一条重跑记录
+    :param run: 重跑记录字典
+    :param tags: 附加字段（如页面）
+    """
+    if not LOG_ENABLED:
+        return
+    entry = {"ts": round(time.time(), 3), **tags,
+             "spans": {k: round(v, 2) for k, v in run["spans"].items()}, "bytes": run["bytes"]}
+    _logger().info(json.dumps(entry, ensure_ascii=False))
+
+
+@contextmanager
+def span(name):
+    """
+    记录一个阶段的自身耗时（扣除嵌套阶段；同一次重跑中同名阶段的耗时累加）
+    :param name: 阶段名称
+    """
+    run = getattr(_LOCAL, "run", None)
+    stack = getattr(_LOCAL, "stack", None)
+    # 最外层的阶段在没有记录（或残留的记录来自被打断的重跑）时自成一条记录
+    standalone = not stack and (run is None or _fragment_rerun())
+    if standalone:
+        start_run()
+        run, stack = _LOCAL.run, _LOCAL.stack
+    # [本阶段内嵌套阶段的总耗时]
+    frame = [0.0]
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        run["spans"][name] = run["spans"].get(name, 0.0) + elapsed - frame[0]
+        if standalone:
+            _LOCAL.run = None
+            _finish(run, fragment=True)
+
+
+def timed(name):
+    """
+    装饰器：把函数的每次调用记为一个阶段
+    :param name: 阶段名称
+    :return: 装饰器
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_bytes(name, size):
+    """
+    记录发往浏览器的数据量（同一次重跑中同名元素的数据量累加）
+    :param name: 元素名称
+    :param size: 字节数（字符串可直接传入其长度）
+    """
+    run = getattr(_LOCAL, "run", None)
+    if run is None:
+        _record(_BYTES, name, size)
+        return
+    run["bytes"][name] = run["bytes"].get(name, 0) + size
+
+
+def _finish(run, **tags):
+    """
+    将重跑记录计入滑动窗口并写入日志
+    :param run: 重跑记录字典
+    :param tags: 附加字段
+    """
+    for name, ms in run["spans"].items():
+        _record(_DURATIONS, name, ms)
+    for name, size in run["bytes"].items():
+        _record(_BYTES, name, size)
+    _emit(run, **tags)
+
+
+def finish_run(**tags):
+    """
+    结束本次重跑的记录
+    :param tags: 写入日志的附加字段（如 page）
+    :return: 本次重跑记录；没有进行中的记录时返回 None
+    """
+    run = getattr(_LOCAL, "run", None)
+    if run is None:
+        return None
+    _LOCAL.run = None
+    _LOCAL.stack = []
+    run["spans"]["total"] = (time.perf_counter() - run["started"]) * 1000
+    _finish(run, **tags)
+    return run
+
+
+def _percentile(values, q):
+    """
+    最近秩法求分位数
+    :param values: 已排序的数值列表
+    :param q: 分位（0~1）
+    :return: 分位数
+    """
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summary():
+    """
+    汇总各阶段的耗时分位数和平均数据量
+    :return: [{"阶段", "次数", "p50 (ms)", "p95 (ms)", "平均字节"}, ...]，按 p95 降序
+    """
+    with _LOCK:
+        durations = {name: sorted(values) for name, values in _DURATIONS.items()}
+        sizes = {name: list(values) for name, values in _BYTES.items()}
+    rows = []
+    for name in set(durations) | set(sizes):
+        values = durations.get(name, [])
+        row = {"阶段": name, "次数": len(values),
+               "p50 (ms)": round(_percentile(values, 0.5), 2) if values else None,
+               "p95 (ms)": round(_percentile(values, 0.95), 2) if values else None,
+               "平均字节": round(sum(sizes[name]) / len(sizes[name])) if sizes.get(name) else None}
+        rows.append(row)
+    rows.sort(key=lambda r: -(r["p95 (ms)"] or 0))
+    return rows
+
+
+def reset():
+    """清空滑动窗口"""
+    with _LOCK:
+        _DURATIONS.clear()
+        _BYTES.clear()
@@ -0,0 +1,115 @@
+"""
+占位图模块
+
+图片加载失败时使用的SVG占位头像和占位海报：
+- 以URL编码的内联SVG（data:image/svg+xml;utf8,...）输出，比Base64小约三分之一
+- 按 (首字母/标题, 颜色, 尺寸) 做有界的 LRU 缓存，同一张占位图在进程内只生成一次
+"""
+
+import html
+import re
+from functools import lru_cache
+
+# 每种占位图最多缓存的数量
+MAX_CACHED = 512
+AVATAR_SIZE = 100
+POSTER_SIZE = (300, 450)
+
+_HEX_RE = re.compile(r"^#([0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
+_SPACE_RE = re.compile(r"\s+")
+# data URI 中必须转义的字符；属性值改用单引号，省去对双引号的转义
+# 占位图地址的前缀（真实图片是 JPEG/WebP/AVIF 的 data URI 或静态文件URL，不会以此开头）
+SVG_PREFIX = "data:image/svg+xml;utf8,"
+_URI_ESCAPES = str.maketrans({"%": "%25", "#": "%23", "<": "%3C", ">": "%3E", '"': "'"})
+
+
+def darken(color, factor=0.6):
+    """
+    将十六进制颜色调暗，用作渐变的终点色
+    :param color: #rgb 或 #rrggbb 颜色
+    :param factor: 亮度系数（0~1，越小越暗）
+    :return: #rrggbb 颜色；无法解析时原样返回
+    """
+    match = _HEX_RE.match(color)
+    if match is None:
+        return color
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    channels = (int(digits[i:i + 2], 16) for i in (0, 2, 4))
+    return "#" + "".join(f"{round(c * factor):02x}" for c in channels)
+
+
+def initials(name):
+    """
+    提取姓名首字母（最多两个）
+    :param name: 人物名称
+    :return: 大写首字母
+    """
+    return "".join(n[0] for n in name.split()[:2]).upper()
+
+
+def svg_data_uri(svg):
+    """
+    将SVG文本转换为URL编码的 data URI（非ASCII字符保持原样）
+    :param svg: SVG文本
+    :return: data URI 字符串
+    """
+    svg = _SPACE_RE.sub(" ", svg.strip()).replace("> <", "><")
+    return SVG_PREFIX + svg.translate(_URI_ESCAPES)
+
+
+def is_placeholder(src):
+    """
+    判断图片地址是否是占位图
+    :param src: 图片地址
+    :return: 是本模块生成的占位图时返回 True
+    """
+    return src.startswith(SVG_PREFIX)
+
+
+@lru_cache(maxsize=MAX_CACHED)
+def avatar(letters, color, size=AVATAR_SIZE):
+    """
+    创建带首字母的圆形占位头像
+    :param letters: 显示的首字母
+    :param color: 背景颜色
+    :param size: 边长（像素）
+    :return: SVG data URI
+    """
+    half = size / 2
+    return svg_data_uri(f"""
+        <svg width="{size}" height="{size}" xmlns="http://www.w3.org/2000/svg">
+            <circle cx="{half:g}" cy="{half:g}" r="{half - 2:g}" fill="{html.escape(color)}" stroke="#ffffff" stroke-width="2"/>
+            <text x="50%" y="55%" font-family="Arial, sans-serif" font-size="{size * 0.4:g}" font-weight="bold"
+                  fill="#ffffff" text-anchor="middle" dominant-baseline="middle">{html.escape(letters)}</text>
+        </svg>
+    """)
+
+
+@lru_cache(maxsize=MAX_CACHED)
+def poster(title, color, size=POSTER_SIZE):
+    """
+    创建渐变背景的占位海报
+    :param title: 剧集名称
+    :param color: 渐变起点颜色（终点为其调暗后的颜色）
+    :param size: (宽, 高)（像素）
+    :return: SVG data URI
+    """
+    width, height = size
+    return svg_data_uri(f"""
+        <svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">
+            <defs>
+                <linearGradient id="bg" x1="0%" y1="0%" x2="100%" y2="100%">
+                    <stop offset="0%" stop-color="{html.escape(color)}"/>
+                    <stop offset="100%" stop-color="{html.escape(darken(color))}"/>
+                </linearGradient>
+            </defs>
+            <rect width="100%" height="100%" fill="url(#bg)"/>
+            <text x="50%" y="40%" font-family="Arial, sans-serif" font-size="24" font-weight="bold"
+                  fill="#ffffff" text-anchor="middle" dominant-baseline="middle">{html.escape(title)}</text>
+            <rect x="20" y="{height - 70}" width="{width - 40}" height="2" fill="#ffffff" opacity="0.7"/>
+            <text x="50%" y="90%" font-family="Arial, sans-serif" font-size="14"
+                  fill="#ffffff" text-anchor="middle" dominant-baseline="middle">欧美剧剧情速通系统</text>
+        </svg>
+    """)
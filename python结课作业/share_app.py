@@ -1,44 +1,146 @@
+import logging
+import os
 import subprocess
+import threading
 import time
 import sys
+import urllib.request
+from logging.handlers import RotatingFileHandler
 from pyngrok import ngrok
 
-def share_streamlit_app(port=8503):
-    # 启动Streamlit应用
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 分享仓库根目录下的应用（与从哪个目录启动本脚本无关）；
+# 根目录应用按相对路径读取 posters/ 等资源，因此也以根目录为工作目录
+APP_DIR = os.path.dirname(BASE_DIR)
+LOG_PATH = os.path.join(APP_DIR, "logs", "streamlit.log")
+# 等待服务就绪的最长时间；轮询间隔从 0.1 秒开始加倍，最长 2 秒
+STARTUP_TIMEOUT = 60
+POLL_INITIAL = 0.1
+POLL_MAX = 2.0
+# 关闭时等待服务退出的时间，超时后强制结束
+STOP_TIMEOUT = 10
+
+def create_log():
+    """
+    创建服务输出的日志（按大小轮转：单个文件 5MB，保留 3 个历史文件）
+    :return: logging.Logger 实例
+    """
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+    logger = logging.getLogger("share_app.streamlit")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = RotatingFileHandler(LOG_PATH, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+def drain_output(process, logger):
+    """
+    持续读取服务的输出写入日志，避免管道写满后服务被阻塞
+    :param process: streamlit 子进程
+    :param logger: 日志器
+    :return: 读取线程
+    """
+    def pump():
+        for line in process.stdout:
+            logger.info(line.decode("utf-8", errors="replace").rstrip())
+        process.stdout.close()
+
+    thread = threading.Thread(target=pump, name="streamlit-output", daemon=True)
+    thread.start()
+    return thread
+
+def wait_until_ready(process, port, timeout=STARTUP_TIMEOUT):
+    """
+    轮询健康检查接口直到服务就绪（间隔指数退避）
+    :param process: streamlit 子进程
+    :param port: 端口
+    :param timeout: 最长等待时间（秒）
+    :return: 实际等待的秒数
+    :raises RuntimeError: 服务提前退出或超时仍未就绪
+    """
+    url = f"http://localhost:{port}/_stcore/health"
+    started = time.monotonic()
+    delay = POLL_INITIAL
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Streamlit 启动失败（退出码 {process.returncode}），详见 {LOG_PATH}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.monotonic() - started
+        except OSError:
+            pass
+        elapsed = time.monotonic() - started
+        if elapsed >= timeout:
+            raise RuntimeError(f"Streamlit 在 {timeout} 秒内没有就绪，详见 {LOG_PATH}")
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, POLL_MAX)
+
+def stop_process(process, timeout=STOP_TIMEOUT):
+    """
+    先请求服务退出，超时后强制结束
+    :param process: streamlit 子进程
+    :param timeout: 等待退出的时间（秒）
+    """
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def share_streamlit_app(port=8503, app_dir=APP_DIR):
+    """
+    启动 app_dir 下的 app.py 并通过 ngrok 分享
+    :param port: 本地端口
+    :param app_dir: 应用所在目录（同时作为工作目录），默认是仓库根目录
+    """
+    # 启动Streamlit应用（输出由后台线程持续写入日志）
     streamlit_process = subprocess.Popen(
-        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(port)],
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(port),
+         "--server.headless", "true"],
         stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
+        stderr=subprocess.STDOUT,
+        cwd=app_dir
     )
-    
-    # 等待应用启动
-    time.sleep(5)
-    
+    output_thread = drain_output(streamlit_process, create_log())
+
     try:
+        # 等待应用启动
+        startup = wait_until_ready(streamlit_process, port)
+        print(f"✅ Streamlit应用已就绪（用时 {startup:.1f} 秒）")
+
         # 设置ngrok隧道
         public_url = ngrok.connect(port)
         print("\n🚀 Streamlit应用已启动并通过ngrok分享！")
         print(f"🔗 本地访问地址: http://localhost:{port}")
+        print(f"📂 应用: {os.path.join(app_dir, 'app.py')}")
         print(f"🌐 公共分享地址: {public_url}")
         print("\n📝 分享说明：")
         print("   - 复制上面的公共分享地址发送给你的朋友")
         print("   - 保持此终端窗口打开，应用才能持续运行")
         print("   - 按 Ctrl+C 关闭应用和分享服务")
+        print(f"   - 服务日志: {LOG_PATH}")
         print("\n🤝 你的朋友可以通过公共分享地址访问你的应用！")
-        
-        # 保持程序运行
-        while True:
+
+        # 保持程序运行，服务意外退出时结束
+        while streamlit_process.poll() is None:
             time.sleep(1)
-            
+        print(f"\n❌ Streamlit应用意外退出（退出码 {streamlit_process.returncode}），详见 {LOG_PATH}")
+
     except KeyboardInterrupt:
         print("\n🛑 正在关闭应用和分享服务...")
-        ngrok.kill()
-        streamlit_process.terminate()
-        print("✅ 应用和分享服务已关闭")
     except Exception as e:
         print(f"❌ 发生错误: {e}")
+    finally:
         ngrok.kill()
-        streamlit_process.terminate()
+        stop_process(streamlit_process)
+        output_thread.join(timeout=STOP_TIMEOUT)
+        print("✅ 应用和分享服务已关闭")
 
 if __name__ == "__main__":
-    share_streamlit_app()
\ No newline at end of file
+    share_streamlit_app()
@@ -0,0 +1,325 @@
+"""
+远程图片下载模块
+
+远程海报通过进程内共享的 requests.Session 下载（复用连接池、设置连接/读取超时、
+对 429 和 5xx 响应退避重试），并缓存到 .cache/remote 目录：
+
+- 缓存在 REVALIDATE_AFTER 秒内视为新鲜，直接使用本地文件，不发请求
+- 过期后带 If-None-Match / If-Modified-Since 重新验证，304 时只刷新时间戳
+- 下载失败但本地有旧文件时继续使用旧文件
+
+页面中只有发起下载的那次调用会等待，同一次重跑中所有海报共用 PAGE_WAIT 秒的预算
+（fetch 的 deadline 参数）；已在下载中的URL不再等待，没下载完的请求在后台线程池中继续，
+下次重跑时即可直接使用。下载失败的URL在退避期（FAILURE_BACKOFF 起，每次失败加倍）内
+不再请求，页面直接使用旧文件或占位图。启动时 prefetch() 并发预取索引中的全部海报URL。
+手动预取：python remote.py [URL ...]
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REMOTE_DIR = os.path.join(BASE_DIR, ".cache", "remote")
+
+# (连接超时, 读取超时)，单位秒
+TIMEOUT = (3.05, 10)
+# 失败重试次数（连接错误、429、5xx）
+RETRIES = 2
+# 连接池大小，同时也是后台下载线程数
+POOL_SIZE = 8
+# 缓存的新鲜期，过期后重新验证
+REVALIDATE_AFTER = int(os.environ.get("TVAPP_REMOTE_MAX_AGE", 24 * 3600))
+# 页面渲染时最多等待下载的时间
+PAGE_WAIT = 1.5
+# 单个文件的大小上限
+MAX_BYTES = 20 * 1024 * 1024
+# 下载失败后的退避时间（秒），连续失败时加倍，最长 MAX_FAILURE_BACKOFF
+FAILURE_BACKOFF = 60
+MAX_FAILURE_BACKOFF = 30 * 60
+
+_STATE = {"session": None, "executor": None}
+# URL -> 正在进行的下载任务
+_INFLIGHT = {}
+# URL -> (退避结束时间, 本次退避秒数)
+_FAILURES = {}
+_LOCK = threading.Lock()
+
+
+def _session():
+    """
+    获取进程内共享的 Session（带连接池和重试策略）
+    :return: requests.Session 实例
+    """
+    if _STATE["session"] is None:
+        with _LOCK:
+            if _STATE["session"] is None:
+                retry = Retry(
+                    total=RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET", "HEAD"),
+                )
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["User-Agent"] = "tv-show-app/1.0"
+                _STATE["session"] = session
+    return _STATE["session"]
+
+
+def _executor():
+    """
+    获取后台下载线程池
+    :return: ThreadPoolExecutor 实例
+    """
+    if _STATE["executor"] is None:
+        with _LOCK:
+            if _STATE["executor"] is None:
+                _STATE["executor"] = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="remote")
+    return _STATE["executor"]
+
+
+def _meta_path(url):
+    """
+    获取URL对应的缓存元数据文件路径
+    :param url: 图片URL
+    :return: JSON文件路径
+    """
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(REMOTE_DIR, f"{key}.json")
+
+
+def _read_meta(url):
+    """
+    读取缓存元数据，缓存文件缺失时视为没有缓存
+    :param url: 图片URL
+    :return: 元数据字典（file, etag, last_modified, fetched_at）；没有缓存时返回 None
+    """
+    try:
+        with open(_meta_path(url), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(os.path.join(REMOTE_DIR, meta.get("file", ""))):
+        return None
+    return meta
+
+
+def _write_atomic(path, write):
+    """
+    先写临时文件再替换，避免其他线程或进程读到写了一半的文件
+    :param path: 目标路径
+    :param write: 接收文件对象并写入内容的函数
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_meta(url, meta):
+    """
+    保存缓存元数据
+    :param url: 图片URL
+    :param meta: 元数据字典
+    """
+    raw = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    _write_atomic(_meta_path(url), lambda f: f.write(raw))
+
+
+def _extension(url, content_type):
+    """
+    根据响应类型（其次是URL路径）确定缓存文件的扩展名
+    :param url: 图片URL
+    :param content_type: 响应的 Content-Type
+    :return: 扩展名，如 ".jpg"
+    """
+    ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) if content_type else None
+    if ext is None:
+        ext = os.path.splitext(urlsplit(url).path)[1].lower() or ".img"
+    return ".jpg" if ext in (".jpe", ".jpeg") else ext
+
+
+def download(url):
+    """
+    下载图片到磁盘缓存（已缓存时做条件请求重新验证）
+    :param url: 图片URL
+    :return: 本地文件路径
+    :raises requests.RequestException: 下载失败（旧缓存由调用方决定是否继续使用）
+    :raises ValueError: 响应不是图片或超过大小上限
+    """
+    meta = _read_meta(url)
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with _session().get(url, headers=headers, timeout=TIMEOUT, stream=True) as resp:
+        if resp.status_code == 304 and meta is not None:
+            meta["fetched_at"] = time.time()
+            _write_meta(url, meta)
+            return os.path.join(REMOTE_DIR, meta["file"])
+        resp.raise_for_status()
+        content_type = resp.headers.get("Content-Type", "")
+        if content_type and not content_type.startswith("image/"):
+            raise ValueError(f"不是图片: {content_type}")
+
+        os.makedirs(REMOTE_DIR, exist_ok=True)
+        name = os.path.basename(_meta_path(url))[:-5] + _extension(url, content_type)
+        path = os.path.join(REMOTE_DIR, name)
+
+        def write(f):
+            size = 0
+            for chunk in resp.iter_content(1 << 16):
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise ValueError(f"图片超过 {MAX_BYTES} 字节")
+                f.write(chunk)
+
+        _write_atomic(path, write)
+        _write_meta(url, {
+            "url": url,
+            "file": name,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        })
+        return path
+
+
+def cached_path(url, max_age=REVALIDATE_AFTER):
+    """
+    获取新鲜的本地缓存，不发任何请求
+    :param url: 图片URL
+    :param max_age: 新鲜期（秒）
+    :return: 本地文件路径；没有缓存或已过期时返回 None
+    """
+    meta = _read_meta(url)
+    if meta is None or time.time() - meta.get("fetched_at", 0) > max_age:
+        return None
+    return os.path.join(REMOTE_DIR, meta["file"])
+
+
+def failed(url):
+    """
+    URL 是否处于下载失败后的退避期
+    :param url: 图片URL
+    :return: 退避期内返回 True
+    """
+    entry = _FAILURES.get(url)
+    return entry is not None and time.monotonic() < entry[0]
+
+
+def _finished(url, future):
+    """
+    下载任务结束：移出进行中的任务，并记录失败（或清除失败记录）
+    :param url: 图片URL
+    :param future: 已结束的 Future
+    """
+    with _LOCK:
+        _INFLIGHT.pop(url, None)
+        if future.exception() is None:
+            _FAILURES.pop(url, None)
+            return
+        previous = _FAILURES.get(url)
+        delay = FAILURE_BACKOFF if previous is None else min(previous[1] * 2, MAX_FAILURE_BACKOFF)
+        _FAILURES[url] = (time.monotonic() + delay, delay)
+
+
+def submit(url):
+    """
+    在后台线程池中下载，同一URL同时只会有一个下载任务
+    :param url: 图片URL
+    :return: Future，结果为本地文件路径
+    """
+    executor = _executor()
+    with _LOCK:
+        future = _INFLIGHT.get(url)
+        if future is not None:
+            return future
+        future = executor.submit(download, url)
+        _INFLIGHT[url] = future
+    # 在锁外注册：任务已结束时回调会在当前线程立即执行，回调中还要获取 _LOCK
+    future.add_done_callback(lambda f: _finished(url, f))
+    return future
+
+
+def _stale_path(url):
+    """
+    获取URL的旧缓存文件（不论是否过期）
+    :param url: 图片URL
+    :return: 本地文件路径；没有缓存时返回 None
+    """
+    meta = _read_meta(url)
+    return os.path.join(REMOTE_DIR, meta["file"]) if meta is not None else None
+
+
+def fetch(url, wait=PAGE_WAIT, deadline=None):
+    """
+    获取远程图片的本地文件。只有发起下载的调用会等待；URL已在下载中或处于失败退避期时立即返回
+    :param url: 图片URL
+    :param wait: 最长等待时间（秒），超时后下载在后台继续
+    :param deadline: 整个页面共用的等待截止时间（time.monotonic()），实际等待不超过它
+    :return: 本地文件路径；下载未完成或处于退避期且没有旧缓存时返回 None
+    :raises Exception: 本次等待的下载失败且没有旧缓存（之后进入退避期）
+    """
+    path = cached_path(url)
+    if path is not None:
+        return path
+    with _LOCK:
+        in_flight = url in _INFLIGHT
+    if in_flight or failed(url):
+        return _stale_path(url)
+    if deadline is not None:
+        wait = min(wait, max(0.0, deadline - time.monotonic()))
+    future = submit(url)
+    try:
+        return future.result(timeout=wait)
+    except FutureTimeout:
+        return _stale_path(url)
+    except Exception:
+        # 下载失败时继续使用旧文件
+        stale = _stale_path(url)
+        if stale is None:
+            raise
+        return stale
+
+
+def prefetch(urls):
+    """
+    并发预取多个URL中缺失或过期的图片（立即返回，不等待下载完成；跳过处于退避期的URL）
+    :param urls: 图片URL序列
+    :return: 已提交的 Future 列表
+    """
+    return [submit(url) for url in dict.fromkeys(urls)
+            if url and not failed(url) and cached_path(url) is None]
+
+
+if __name__ == "__main__":
+    import catalog
+
+    targets = sys.argv[1:] or [e["poster_url"] for e in catalog.load_index() if e.get("poster_url")]
+    for url in dict.fromkeys(targets):
+        start = time.perf_counter()
+        try:
+            print(f"{download(url)}  {time.perf_counter() - start:.2f}s  {url}")
+        except Exception as e:
+            print(f"失败  {url}: {e}")
@@ -0,0 +1,157 @@
+"""
+全文检索模块
+
+对所有剧集的标题、简介、季名、分集剧情、角色和问答题目建立倒排索引。
+中文按字的二元组（bigram）切分，英文和数字按单词及其前缀切分，
+因此"比利"、"逆世界"、"Runn"都能命中。
+
+索引在进程内只构建一次，剧集索引文件或任一剧集文件变化后才会重建。
+"""
+
+import re
+import threading
+
+import catalog
+
+# 中日韩统一表意文字及常用扩展
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_WORD_RE = re.compile(r"[0-9a-z]+")
+# 英文单词索引的最大前缀长度
+_MAX_PREFIX = 12
+
+# 结果类型及其排序权重（越小越靠前）
+KIND_ORDER = {"show": 0, "character": 1, "season": 2, "episode": 3, "quiz": 4}
+
+_STATE = {"version": None, "index": None}
+_LOCK = threading.Lock()
+
+
+def tokenize(text, prefixes=False):
+    """
+    将文本切分为检索词
+    :param text: 原始文本
+    :param prefixes: 是否为英文单词额外生成前缀（建索引时使用）
+    :return: 检索词集合
+    """
+    text = text.lower()
+    tokens = set()
+    for run in _CJK_RE.findall(text):
+        if len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+            if prefixes:
+                # 单字也入索引，保证单字查询可以命中
+                tokens.update(run)
+    for word in _WORD_RE.findall(text):
+        if prefixes:
+            tokens.update(word[:n] for n in range(1, min(len(word), _MAX_PREFIX) + 1))
+        else:
+            tokens.add(word[:_MAX_PREFIX])
+    return tokens
+
+
+class SearchIndex:
+    """
+    倒排索引：检索词 -> 文档编号集合
+    每个文档是一个可跳转的位置（剧集、季、分集、角色或题目）
+    """
+
+    def __init__(self):
+        self.docs = []
+        self.postings = {}
+
+    def add(self, text, **target):
+        """
+        添加一个文档
+        :param text: 参与检索的文本
+        :param target: 跳转目标信息（show_id, title, kind, season, label）
+        """
+        doc_id = len(self.docs)
+        self.docs.append(target)
+        for token in tokenize(text, prefixes=True):
+            self.postings.setdefault(token, set()).add(doc_id)
+
+    def search(self, query, limit=10):
+        """
+        检索同时包含所有检索词的文档
+        :param query: 查询字符串
+        :param limit: 最多返回的结果数量
+        :return: 跳转目标字典列表
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # 从最短的倒排表开始求交集
+        postings = sorted((self.postings.get(t, ()) for t in tokens), key=len)
+        hits = set(postings[0])
+        for posting in postings[1:]:
+            hits &= posting
+            if not hits:
+                return []
+        ranked = sorted(hits, key=lambda d: (KIND_ORDER[self.docs[d]["kind"]], d))
+        return [self.docs[d] for d in ranked[:limit]]
+
+
+def build_index():
+    """
+    遍历剧集目录，构建全文检索索引
+    :return: SearchIndex 实例
+    """
+    index = SearchIndex()
+    for entry in catalog.load_index():
+        # 不经 load_show 的缓存，建索引不会让所有剧集常驻内存
+        show = catalog.read_show(entry["id"])
+        if show is None:
+            continue
+        target = {"show_id": show["id"], "title": show["title"]}
+        index.add(f"{show['title']} {show.get('genre', '')} {show.get('summary', '')}",
+                  kind="show", season=None, label=show["title"], **target)
+        for name, _ in show.get("nodes", []):
+            index.add(name, kind="character", season=None, label=name, **target)
+        for season, episodes in show.get("episodes", {}).items():
+            index.add(season, kind="season", season=season, label=season, **target)
+            for ep in episodes:
+                index.add(ep, kind="episode", season=season, label=ep, **target)
+        for item in show.get("quiz", []):
+            index.add(f"{item['q']} {' '.join(item['options'])}",
+                      kind="quiz", season=None, label=item["q"], **target)
+    return index
+
+
+def index_version():
+    """
+    获取检索索引依赖的数据版本：索引文件和每部剧集文件的版本
+    :return: (目录版本, ((剧集ID, 剧集版本), ...)) 元组；剧集文件不存在时其版本为 None
+    """
+    shows = []
+    for entry in catalog.load_index():
+        try:
+            shows.append((entry["id"], catalog.show_version(entry["id"])))
+        except FileNotFoundError:
+            shows.append((entry["id"], None))
+    return catalog.catalog_version(), tuple(shows)
+
+
+def get_index():
+    """
+    获取进程内共享的检索索引，剧集目录或任一剧集文件变化时重建
+    :return: SearchIndex 实例
+    """
+    version = index_version()
+    if _STATE["version"] != version:
+        with _LOCK:
+            if _STATE["version"] != version:
+                _STATE["index"] = build_index()
+                _STATE["version"] = version
+    return _STATE["index"]
+
+
+def search(query, limit=10):
+    """
+    在全部剧集中检索
+    :param query: 查询字符串
+    :param limit: 最多返回的结果数量
+    :return: 跳转目标字典列表
+    """
+    return get_index().search(query, limit)
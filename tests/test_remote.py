@@ -0,0 +1,162 @@
+"""
+remote.py 的测试：用本地 http.server 模拟图片服务器，不访问外网
+
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import remote  # noqa: E402
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """按路径模拟不同的服务端行为，并记录收到的请求"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path.startswith("/slow"):
+            # 接受连接但迟迟不响应
+            time.sleep(self.server.slow_for)
+            return
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(IMAGE)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+class RemoteTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.slow_for = 1.0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.saved = {name: getattr(remote, name) for name in ("REMOTE_DIR", "TIMEOUT", "FAILURE_BACKOFF")}
+        remote.REMOTE_DIR = self.cache_dir
+        remote.TIMEOUT = (0.5, 0.3)
+        remote.FAILURE_BACKOFF = 60
+        remote._FAILURES.clear()
+        remote._INFLIGHT.clear()
+        # 不在测试中重试，使超时用例的耗时可控
+        remote._STATE["session"] = remote.requests.Session()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for name, value in self.saved.items():
+            setattr(remote, name, value)
+        remote._STATE["session"] = None
+        remote._FAILURES.clear()
+        remote._INFLIGHT.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _wait_done(self, url):
+        """等待后台下载结束"""
+        deadline = time.monotonic() + 5
+        while url in remote._INFLIGHT and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    def test_download_and_cache(self):
+        url = self.base + "/poster.png"
+        path = remote.fetch(url)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), IMAGE)
+        # 新鲜期内直接使用缓存，不再请求
+        self.assertEqual(remote.fetch(url), path)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_revalidate_with_304(self):
+        url = self.base + "/poster.png"
+        path = remote.download(url)
+        self.assertIsNone(remote.cached_path(url, max_age=-1))
+        # 过期后带 If-None-Match 重新验证，304 时沿用原文件
+        self.assertEqual(remote.download(url), path)
+        self.assertEqual(self.server.requests[-1][1].get("If-None-Match"), ETAG)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIsNotNone(remote.cached_path(url))
+
+    def test_timeout_waits_once(self):
+        url = self.base + "/slow.png"
+        start = time.monotonic()
+        self.assertIsNone(remote.fetch(url, wait=0.1))
+        self.assertLess(time.monotonic() - start, 0.3)
+        # 下载仍在进行时，后续调用不再等待
+        start = time.monotonic()
+        self.assertIsNone(remote.fetch(url, wait=1.0))
+        self.assertLess(time.monotonic() - start, 0.05)
+        # 读取超时后进入退避期
+        self._wait_done(url)
+        self.assertTrue(remote.failed(url))
+
+    def test_shared_deadline(self):
+        urls = [f"{self.base}/slow{i}.png" for i in range(3)]
+        deadline = time.monotonic() + 0.2
+        start = time.monotonic()
+        for url in urls:
+            self.assertIsNone(remote.fetch(url, wait=1.0, deadline=deadline))
+        # 三个失效地址共用 0.2 秒的预算，而不是各等 1 秒
+        self.assertLess(time.monotonic() - start, 0.4)
+
+    def test_failure_backoff(self):
+        url = self.base + "/missing.png"
+        with self.assertRaises(remote.requests.HTTPError):
+            remote.fetch(url)
+        self._wait_done(url)
+        self.assertTrue(remote.failed(url))
+        # 退避期内立即返回，不再请求
+        self.assertIsNone(remote.fetch(url))
+        self.assertEqual(remote.prefetch([url]), [])
+        self.assertEqual(len(self.server.requests), 1)
+        # 退避期结束后重新请求，再次失败时退避时间加倍
+        _, delay = remote._FAILURES[url]
+        remote._FAILURES[url] = (time.monotonic() - 1, delay)
+        with self.assertRaises(remote.requests.HTTPError):
+            remote.fetch(url)
+        self._wait_done(url)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(remote._FAILURES[url][1], delay * 2)
+
+    def test_failure_uses_stale_copy(self):
+        url = self.base + "/poster.png"
+        path = remote.download(url)
+        self.server.shutdown()
+        self.server.server_close()
+        # 缓存过期且服务器不可用时继续使用旧文件
+        meta = remote._read_meta(url)
+        meta["fetched_at"] = 0
+        remote._write_meta(url, meta)
+        self.assertEqual(remote.fetch(url, wait=2), path)
+        self._wait_done(url)
+        self.assertTrue(remote.failed(url))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,318 @@
+"""
+主题样式模块（变色龙引擎）
+
+所有剧集共用同一份 CSS 模板，每部剧只在数据文件的 "theme" 字段中
+提供自己的配色、字体等参数。样式表在首次使用时编译并压缩，
+之后按剧集ID直接取用，新剧集无需新增任何代码分支。
+"""
+
+import re
+import threading
+from string import Template
+
+import catalog
+
+# 首页与剧集页共用的样式
+BASE_CSS = """
+    .sidebar-title {
+        font-size: 1.7rem !important;
+    }
+"""
+
+# 首页样式 - Netflix风格
+HOME_CSS = """
+    .main, .reportview-container, .stApp {
+        background-color: #000000 !important;
+        background-image: linear-gradient(135deg, #000000 0%, #1a1a1a 100%) !important;
+    }
+
+    body {
+        background-color: #000000 !important;
+        color: #ffffff !important;
+        font-family: 'Arial', sans-serif !important;
+    }
+
+    h1 {
+        color: #E50914 !important;
+        font-size: 4rem !important;
+        font-weight: bold !important;
+        text-align: center !important;
+        margin-top: 50px !important;
+        margin-bottom: 20px !important;
+    }
+
+    h2 {
+        color: #ffffff !important;
+        font-size: 1.5rem !important;
+        text-align: center !important;
+        margin-bottom: 50px !important;
+        opacity: 1;
+    }
+    /* 增强文本对比度 */
+    .markdown-text-container {
+        color: #ffffff !important;
+        opacity: 1 !important;
+    }
+    /* 确保所有文本都清晰可见 */
+    p, span, div {
+        color: #ffffff !important;
+        opacity: 1 !important;
+    }
+
+    .poster-column {
+        text-align: center !important;
+        padding: 20px !important;
+    }
+
+    .poster-column img {
+        border-radius: 8px !important;
+        box-shadow: 0 10px 30px rgba(0, 0, 0, 0.5) !important;
+        transition: transform 0.3s ease !important;
+        margin-bottom: 15px !important;
+    }
+
+    .poster-column img:hover {
+        transform: scale(1.05) !important;
+    }
+
+    .poster-column h3 {
+        color: #ffffff !important;
+        font-size: 1.2rem !important;
+        font-weight: bold !important;
+        margin-top: 10px !important;
+    }
+
+    /* 确保侧边栏样式不受影响 */
+    [data-testid="stSidebar"] {
+        background-color: rgba(26, 26, 46, 0.98) !important;
+        color: #ffffff !important;
+    }
+    /* 侧边栏按钮样式 */
+    [data-testid="stSidebar"] .stButton > button {
+        color: #ffffff !important;
+        background-color: rgba(255, 255, 255, 0.1) !important;
+        border: 1px solid rgba(255, 255, 255, 0.2) !important;
+    }
+"""
+
+# 剧集页样式模板，$name 为主题参数
+SHOW_CSS = Template("""
+    /* 页面背景 - 更具体的选择器 */
+    .main, .reportview-container, .stApp {
+        background-color: $background !important;
+        background-image: $background_image !important;
+    }
+
+    body {
+        background-color: $background !important;
+        font-family: $font_body !important;
+        color: $text_color !important;
+        font-size: 16px;
+        line-height: 1.8;
+        font-weight: 500;
+    }
+
+    /* 标题样式 */
+    h1, h2, h3, h4 {
+        color: $accent !important;
+        text-shadow: $heading_shadow;
+        font-family: $font_heading;
+        letter-spacing: $heading_spacing;
+        $heading_extra
+        font-size: 1.8em;
+        font-weight: bold;
+    }
+
+    /* 按钮样式 */
+    .stButton > button {
+        color: $button_text;
+        background-color: $accent;
+        border: $button_border;
+        border-radius: $button_radius;
+        padding: $button_padding;
+        font-weight: bold;
+        $button_extra
+        transition: all 0.3s ease;
+        font-size: 14px;
+    }
+
+    .stButton > button:hover {
+        $button_hover
+    }
+
+    /* 侧边栏样式 */
+    [data-testid="stSidebar"] {
+        background-color: $sidebar_background !important;
+        border-right: 3px solid $accent !important;
+        padding: 20px !important;
+        color: $text_color !important;
+        font-weight: 600 !important;
+        font-size: 16px !important;
+    }
+
+    /* 侧边栏标题样式 */
+    [data-testid="stSidebar"] h1, [data-testid="stSidebar"] h2, [data-testid="stSidebar"] h3 {
+        color: $accent !important;
+        text-shadow: $sidebar_heading_shadow;
+        margin-bottom: 15px !important;
+    }
+
+    /* 卡片样式 */
+    .stExpander {
+        border-left: 4px solid $accent;
+        background-color: $card_background !important;
+        border-radius: $card_radius;
+        margin-bottom: $card_margin;
+        padding: 15px;
+    }
+
+    /* 文本样式 */
+    p, span, div, .markdown-text-container {
+        color: $text_color !important;
+        font-weight: 600;
+        font-size: 17px;
+        text-shadow: $text_shadow;
+    }
+
+    /* 进度条样式 */
+    .stProgress > div > div > div {
+        background-color: $accent;
+        $progress_extra
+    }
+
+    /* 分隔线样式 */
+    .css-1n7v3ny {
+        border-top: 2px solid ${accent}44;
+    }
+
+    /* 确保所有容器都使用深色背景 */
+    .block-container, .css-18e3th9 {
+        background-color: transparent !important;
+    }
+
+    /* 优化链接颜色 */
+    a {
+        color: $link_color !important;
+        text-decoration: none !important;
+    }
+
+    /* 优化图片容器 */
+    .stImage > div {
+        background-color: transparent !important;
+    }
+
+    /* 人物关系图背景样式 */
+    [data-testid="stAppViewContainer"] .streamlit-agraph,
+    [data-testid="stAppViewContainer"] .streamlit-agraph > div,
+    [data-testid="stAppViewContainer"] .streamlit-agraph > div > div,
+    [data-testid="stAppViewContainer"] .vis-network,
+    [data-testid="stAppViewContainer"] .vis-network canvas {
+        background: $background !important;
+        background-color: $background !important;
+    }
+""")
+
+# 主题参数默认值；参数值中可以用 $accent 引用主题色
+DEFAULT_THEME = {
+    "background": "#1a1a2e",
+    "background_image": "none",
+    "font_body": "'Arial', sans-serif",
+    "text_color": "#ffffff",
+    "heading_shadow": "1px 1px 3px rgba(0, 0, 0, 0.5)",
+    "font_heading": "sans-serif",
+    "heading_spacing": "1px",
+    "heading_extra": "",
+    "button_text": "white",
+    "button_border": "none",
+    "button_radius": "8px",
+    "button_padding": "10px 20px",
+    "button_extra": "",
+    "button_hover": "filter: brightness(1.15);",
+    "sidebar_background": "rgba(26, 26, 46, 0.98)",
+    "sidebar_heading_shadow": "1px 1px 3px rgba(0, 0, 0, 0.5)",
+    "card_background": "rgba(255, 255, 255, 0.1)",
+    "card_radius": "8px",
+    "card_margin": "10px",
+    "text_shadow": "1px 1px 3px rgba(0, 0, 0, 0.7)",
+    "progress_extra": "",
+    "link_color": "#4facfe",
+}
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"\s*([{};:,>])\s*")
+
+# 编译结果：剧集ID -> (剧集数据版本, 压缩后的 <style> 标签)
+_COMPILED = {}
+_LOCK = threading.Lock()
+
+
+def minify(css):
+    """
+    压缩CSS：去掉注释、多余空白和末尾分号
+    :param css: CSS文本
+    :return: 压缩后的CSS文本
+    """
+    css = _COMMENT_RE.sub("", css)
+    css = _SPACE_RE.sub(" ", css)
+    css = _PUNCT_RE.sub(r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _style_tag(css):
+    """
+    将CSS包装为可通过 st.markdown 注入的 <style> 标签
+    :param css: CSS文本
+    :return: 压缩后的 <style> 标签字符串
+    """
+    return f"<style>{minify(css)}</style>"
+
+
+def theme_tokens(show):
+    """
+    合并默认参数与剧集自定义参数，并展开其中的 $accent 引用
+    :param show: 剧集数据（需包含 theme_color，可选 theme）
+    :return: 主题参数字典
+    """
+    tokens = dict(DEFAULT_THEME)
+    tokens.update(show.get("theme", {}))
+    accent = tokens.setdefault("accent", show["theme_color"])
+    return {k: Template(v).safe_substitute(accent=accent) for k, v in tokens.items()}
+
+
+def compile_show_css(show):
+    """
+    根据模板编译一部剧集的样式表
+    :param show: 剧集数据
+    :return: 压缩后的 <style> 标签字符串
+    """
+    return _style_tag(BASE_CSS + SHOW_CSS.substitute(theme_tokens(show)))
+
+
+def show_css(show):
+    """
+    获取剧集样式表，每部剧只在首次使用或数据变化时编译一次
+    :param show: 剧集数据
+    :return: 压缩后的 <style> 标签字符串
+    """
+    version = catalog.show_version(show["id"])
+    compiled = _COMPILED.get(show["id"])
+    if compiled is not None and compiled[0] == version:
+        return compiled[1]
+    with _LOCK:
+        compiled = (version, compile_show_css(show))
+        _COMPILED[show["id"]] = compiled
+    return compiled[1]
+
+
+def graph_background(show):
+    """
+    获取人物关系图的背景色（与页面背景一致）
+    :param show: 剧集数据
+    :return: 颜色字符串
+    """
+    return theme_tokens(show)["background"]
+
+
+# 首页样式不依赖剧集数据，导入时编译一次
+HOME_STYLE = _style_tag(BASE_CSS + HOME_CSS)
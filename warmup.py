@@ -0,0 +1,129 @@
+"""
+资源预热模块
+
+把首次访问时才会发生的工作提前做完：海报和头像的缩放、编码（以及静态模式下的发布），
+关系图布局、网络分析、剧集样式表和全文检索索引。
+
+- python warmup.py：部署后、启动服务前运行，为全部剧集生成磁盘上的衍生图、布局和分析结果，
+  并输出每一项的耗时
+- app.py 在进程首次运行时调用 start()，在后台线程中只预热首页第一页的 WARM_SHOWS 部剧
+
+图片只生成磁盘上的衍生图（静态模式下同时发布），不预先编码 data URI：
+大部分格式不会被实际发送，编码结果只会把有用的条目挤出 assets 的内存缓存。
+剧集数据经 catalog.read_show() 读取，预热不会让所有剧集常驻内存。
+
+图片处理（Pillow 的缩放与编码、文件读取、Base64 编码）大部分时间不持有 GIL，
+因此用线程池即可并行；线程池还能让结果直接留在当前进程的缓存中。
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import analytics
+import assets
+import catalog
+import graph
+import search
+import themes
+
+# 预热线程数（参考 ThreadPoolExecutor 的默认值 CPU核数+4，部分时间花在文件读写上）
+WORKERS = min(8, (os.cpu_count() or 1) + 4)
+# 后台预热的剧集数（与首页每页的剧集数一致）
+WARM_SHOWS = int(os.environ.get("TVAPP_WARMUP_SHOWS", 9))
+
+_STATE = {"thread": None, "results": None}
+_LOCK = threading.Lock()
+
+
+def plan(limit=WARM_SHOWS):
+    """
+    列出需要预热的任务
+    :param limit: 按索引顺序预热的剧集数，None 表示全部剧集
+    :return: [(任务名称, 函数, 参数元组), ...]
+    """
+    # 静态模式下衍生图还要发布到静态目录，内联模式只生成衍生图
+    prepare = assets.static_url if assets.ASSET_MODE == "static" else assets.derivative_path
+    tasks = {}
+    for entry in catalog.load_index()[:limit]:
+        show = catalog.read_show(entry["id"])
+        if show is None:
+            continue
+        version = catalog.show_version(show["id"])
+        # 海报用于首页网格和剧集页横幅，头像用于关系图节点；同一图片只处理一次。
+        # 每种可编码的格式都生成，不同浏览器协商出的格式都不必现场缩放编码
+        images = [(avatar, "node") for _, avatar in show["nodes"]]
+        if not show.get("poster_url"):
+            images = [(show["poster"], "grid"), (show["poster"], "banner")] + images
+        for path, variant in images:
+            for fmt in assets.AVAILABLE_FORMATS:
+                tasks.setdefault(f"{path} [{variant}/{fmt}]", (prepare, (path, variant, fmt)))
+        tasks[f"{show['id']} 布局"] = (graph.graph_layout, (show, version))
+        tasks[f"{show['id']} 网络分析"] = (analytics.ensure, (show, version))
+        tasks[f"{show['id']} 样式表"] = (themes.show_css, (show,))
+    tasks["全文检索索引"] = (search.get_index, ())
+    return [(name, fn, args) for name, (fn, args) in tasks.items()]
+
+
+def _timed(name, fn, args):
+    """
+    执行单个任务并计时
+    :return: (任务名称, 耗时秒数, 错误信息或 None)
+    """
+    start = time.perf_counter()
+    try:
+        fn(*args)
+        error = None
+    except Exception as e:
+        # 单个资源失败不影响其他资源，页面上会退回默认图片
+        error = f"{type(e).__name__}: {e}"
+    return name, time.perf_counter() - start, error
+
+
+def run(workers=WORKERS, limit=WARM_SHOWS):
+    """
+    用线程池并发执行预热任务
+    :param workers: 线程数
+    :param limit: 预热的剧集数，None 表示全部剧集（见 plan()）
+    :return: [(任务名称, 耗时秒数, 错误信息或 None), ...]，按计划顺序排列
+    """
+    tasks = plan(limit)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup") as pool:
+        return list(pool.map(lambda task: _timed(*task), tasks))
+
+
+def _run_in_background():
+    """后台线程入口，结果保存在 _STATE 中供调试查看"""
+    _STATE["results"] = run()
+
+
+def start():
+    """
+    在后台线程中预热当前进程的缓存，每个进程只启动一次
+    :return: 预热线程
+    """
+    with _LOCK:
+        if _STATE["thread"] is None:
+            thread = threading.Thread(target=_run_in_background, name="warmup", daemon=True)
+            thread.start()
+            _STATE["thread"] = thread
+        return _STATE["thread"]
+
+
+def results():
+    """
+    获取后台预热的结果
+    :return: run() 的返回值；尚未完成时返回 None
+    """
+    return _STATE["results"]
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    timings = run(limit=None)
+    wall = time.perf_counter() - started
+    for name, seconds, error in sorted(timings, key=lambda t: -t[1]):
+        print(f"{seconds * 1000:8.1f} ms  {name}" + (f"  失败: {error}" if error else ""))
+    total = sum(t[1] for t in timings)
+    print(f"共 {len(timings)} 项，累计 {total:.2f}s，实际用时 {wall:.2f}s（{WORKERS} 个线程）")